@@ -0,0 +1,174 @@
+import os
+import numpy as np
+from typing import List, Tuple, Optional, Sequence
+from vector_index import VectorIndex
+
+class IVFIndex(VectorIndex):
+    def __init__(self, dimension: Optional[int] = None, n_probe: int = 8, min_train_size: int = 2048,
+                 retrain_growth: float = 4.0, kmeans_iterations: int = 10, sample_size: int = 20000):
+        super().__init__(dimension)
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self.kmeans_iterations = kmeans_iterations
+        self.sample_size = sample_size
+        self.centroids = None
+        self.trained_size = 0
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists = []
+        self._list_arrays = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def add(self, embedding: Sequence[float]) -> int:
+        row = super().add(embedding)
+        self._after_insert(row, self.size)
+        return row
+
+    def add_many(self, embeddings: Sequence[Sequence[float]]) -> List[int]:
+        start = self.size
+        rows = super().add_many(embeddings)
+        self._after_insert(start, self.size)
+        return rows
+
+    def replace(self, row: int, embedding: Sequence[float]):
+        super().replace(row, embedding)
+        if not self.is_trained:
+            return
+        previous = int(self._assignments[row])
+        current = int(np.argmax(self.centroids @ self.vectors[row]))
+        if current != previous:
+            self._lists[previous].remove(row)
+            self._lists[current].append(row)
+            self._list_arrays[previous] = None
+            self._list_arrays[current] = None
+            self._assignments[row] = current
+
+    def _after_insert(self, start: int, end: int):
+        if self.is_trained:
+            self._assign(start, end)
+
+    def needs_training(self) -> bool:
+        if not self.is_trained:
+            return self.size >= self.min_train_size
+        return self.size >= self.trained_size * self.retrain_growth
+
+    def _assign(self, start: int, end: int):
+        if start >= end:
+            return
+        assignments = np.argmax(self.vectors[start:end] @ self.centroids.T, axis=1).astype(np.int32)
+        self._assignments = np.concatenate([self._assignments[:start], assignments])
+        for offset, list_id in enumerate(assignments):
+            self._lists[list_id].append(start + offset)
+            self._list_arrays[list_id] = None
+
+    def _rebuild_lists(self):
+        n_lists = len(self.centroids)
+        order = np.argsort(self._assignments, kind="stable")
+        bounds = np.searchsorted(self._assignments[order], np.arange(n_lists + 1))
+        self._list_arrays = [order[bounds[i]:bounds[i + 1]].astype(np.int64) for i in range(n_lists)]
+        self._lists = [array.tolist() for array in self._list_arrays]
+
+    def train(self, n_lists: Optional[int] = None, seed: int = 0):
+        if self.size == 0:
+            return
+        self.install(*self.fit(self.vectors, n_lists, seed))
+
+    def fit(self, vectors: np.ndarray, n_lists: Optional[int] = None, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        # Reads only the given snapshot, so it can run on another thread while rows are appended
+        size = len(vectors)
+        n_lists = n_lists or max(1, int(np.sqrt(size)))
+        n_lists = min(n_lists, size)
+        rng = np.random.default_rng(seed)
+
+        sample = vectors
+        if size > self.sample_size:
+            sample = vectors[rng.choice(size, self.sample_size, replace=False)]
+
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=n_lists)
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+            centroids = self.normalize(sums)
+
+        centroids = centroids.astype(np.float32)
+        return centroids, np.argmax(vectors @ centroids.T, axis=1).astype(np.int32)
+
+    def install(self, centroids: np.ndarray, assignments: np.ndarray):
+        # Rows added after the fitted snapshot are assigned here
+        self.centroids = centroids
+        self.trained_size = len(assignments)
+        self._assignments = assignments
+        self._rebuild_lists()
+        self._assign(len(assignments), self.size)
+
+    def search(self, query: Sequence[float], top_k: int, threshold: Optional[float] = None) -> List[Tuple[int, float]]:
+        # Training is left to the owner (see needs_training); until then queries are answered exactly
+        if not self.is_trained:
+            return super().search(query, top_k, threshold)
+        if self.size == 0 or top_k <= 0 or not self.accepts(query):
+            return []
+
+        normalized_query = self.normalize(query)
+        n_probe = min(self.n_probe, len(self.centroids))
+        centroid_scores = self.centroids @ normalized_query
+        probed = np.argpartition(-centroid_scores, n_probe - 1)[:n_probe]
+
+        for list_id in probed:
+            if self._list_arrays[list_id] is None:
+                self._list_arrays[list_id] = np.asarray(self._lists[list_id], dtype=np.int64)
+        candidates = np.concatenate([self._list_arrays[list_id] for list_id in probed])
+        if candidates.size == 0:
+            return []
+
+        scores = self.vectors[candidates] @ normalized_query
+        top_k = min(top_k, scores.size)
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best], kind="stable")]
+
+        results = []
+        for position in best:
+            score = float(scores[position])
+            if threshold is not None and score <= threshold:
+                break
+            results.append((int(candidates[position]), score))
+        return results
+
+    def save(self, file_path: str):
+        if not self.is_trained:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            return
+        temp_path = f"{file_path}.tmp.npz"
+        np.savez(temp_path, centroids=self.centroids, assignments=self._assignments[:self.size],
+                 trained_size=np.int64(self.trained_size))
+        os.replace(temp_path, file_path)
+
+    def load(self, file_path: str) -> bool:
+        if not os.path.exists(file_path) or self.size == 0:
+            return False
+        try:
+            with np.load(file_path) as data:
+                centroids = data["centroids"]
+                assignments = data["assignments"]
+                trained_size = int(data["trained_size"])
+        except Exception as e:
+            print(f"Error loading ANN index: {str(e)}")
+            return False
+
+        if centroids.shape[1] != self.dimension or len(assignments) > self.size:
+            return False
+
+        self.centroids = centroids.astype(np.float32)
+        self.trained_size = trained_size
+        self._assignments = assignments.astype(np.int32)
+        self._rebuild_lists()
+        self._assign(len(assignments), self.size)
+        return True
@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from vector_index import VectorIndex
+from ann_index import IVFIndex
+
+def make_dataset(size: int, dimension: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((size, dimension)).astype(np.float32)
+    query_labels = rng.integers(0, clusters, 200)
+    queries = centers[query_labels] + 0.6 * rng.standard_normal((200, dimension)).astype(np.float32)
+    return vectors, queries
+
+def time_queries(index, queries, top_k):
+    timings = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        results.append([row for row, _ in index.search(query, top_k)])
+        timings.append((time.perf_counter() - started) * 1000)
+    return results, np.percentile(timings, 50), np.percentile(timings, 95)
+
+def recall(exact_results, approximate_results):
+    hits = sum(len(set(exact) & set(approximate)) for exact, approximate in zip(exact_results, approximate_results))
+    total = sum(len(exact) for exact in exact_results)
+    return hits / total if total else 1.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency of IVF memory retrieval against exact search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'backend':>12} {'recall':>8} {'p50 ms':>9} {'p95 ms':>9}")
+    for size in args.sizes:
+        vectors, queries = make_dataset(size, args.dimension, clusters=max(16, size // 500))
+
+        exact = VectorIndex()
+        exact.add_many(vectors)
+        exact_results, p50, p95 = time_queries(exact, queries, args.top_k)
+        print(f"{size:>8} {'exact':>12} {1.0:>8.3f} {p50:>9.3f} {p95:>9.3f}")
+
+        ivf = IVFIndex(min_train_size=0)
+        ivf.add_many(vectors)
+        started = time.perf_counter()
+        ivf.train()
+        print(f"{size:>8} {'ivf train':>12} {'':>8} {(time.perf_counter() - started) * 1000:>9.1f}")
+        for n_probe in args.probes:
+            ivf.n_probe = n_probe
+            approximate_results, p50, p95 = time_queries(ivf, queries, args.top_k)
+            label = f"ivf p={n_probe}"
+            print(f"{size:>8} {label:>12} {recall(exact_results, approximate_results):>8.3f} {p50:>9.3f} {p95:>9.3f}")
+
+if __name__ == "__main__":
+    main()
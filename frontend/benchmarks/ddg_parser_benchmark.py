@@ -0,0 +1,78 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import tracemalloc
+import numpy as np
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ddg_parser import parse_results
+
+FIXTURES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+def parse_with_soup(page: bytes, limit: int):
+    # The extraction WebSearchHandler used before the streaming parser
+    soup = BeautifulSoup(page.decode("utf-8"), 'lxml')
+    results = []
+    for result in soup.select('.result__body'):
+        title_elem = result.select_one('.result__title a')
+        snippet_elem = result.select_one('.result__snippet')
+        if title_elem and snippet_elem:
+            title = title_elem.text.strip()
+            snippet = snippet_elem.text.strip()
+            url = title_elem.get('href', '')
+            if url and title and snippet:
+                results.append({'title': title, 'url': url, 'content': snippet})
+                if len(results) >= limit:
+                    break
+    return results
+
+def parse_streaming(page: bytes, limit: int, chunk_size: int):
+    return parse_results((page[start:start + chunk_size] for start in range(0, len(page), chunk_size)), limit)
+
+def measure(function, repeats: int):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        results = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return results, np.percentile(timings, 50), np.percentile(timings, 95), peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse time and peak allocation of DuckDuckGo result extraction")
+    parser.add_argument("--fixtures", default=FIXTURES_FOLDER, help="folder with saved DuckDuckGo HTML pages")
+    parser.add_argument("--limits", type=int, nargs="+", default=[6, 30])
+    parser.add_argument("--chunk-size", type=int, default=8192)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    pages = sorted(glob.glob(os.path.join(args.fixtures, "*.html")))
+    if not pages:
+        print(f"No fixture pages in {args.fixtures}")
+        return
+
+    print(f"{'page':>22} {'limit':>6} {'parser':>10} {'results':>8} {'p50 ms':>8} {'p95 ms':>8} {'peak KB':>9}")
+    for path in pages:
+        with open(path, "rb") as file:
+            page = file.read()
+        for limit in args.limits:
+            baseline = None
+            for name, function in [
+                ("soup", lambda: parse_with_soup(page, limit)),
+                ("streaming", lambda: parse_streaming(page, limit, args.chunk_size))
+            ]:
+                results, p50, p95, peak = measure(function, args.repeats)
+                if baseline is None:
+                    baseline = results
+                elif [result['url'] for result in results] != [result['url'] for result in baseline]:
+                    print(f"Warning: {name} results differ from the BeautifulSoup path")
+                print(f"{os.path.basename(path)[:22]:>22} {limit:>6} {name:>10} {len(results):>8} {p50:>8.2f} {p95:>8.2f} {peak / 1024:>9.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from vector_index import VectorIndex
+from quantized_index import QuantizedIndex
+from ann_benchmark import make_dataset, recall
+
+def run_queries(index, queries, top_k, threshold):
+    timings = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(index.search(query, top_k, threshold))
+        timings.append((time.perf_counter() - started) * 1000)
+    return results, np.percentile(timings, 50), np.percentile(timings, 95)
+
+def threshold_agreement(exact_results, quantized_results):
+    matches = sum(
+        {row for row, _ in exact} == {row for row, _ in quantized}
+        for exact, quantized in zip(exact_results, quantized_results)
+    )
+    return matches / len(exact_results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy and speed of quantized memory scoring with exact re-ranking")
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--rerank", type=int, nargs="+", default=[64, 256, 1024])
+    args = parser.parse_args()
+
+    vectors, queries = make_dataset(args.size, args.dimension, clusters=max(16, args.size // 500))
+    exact = VectorIndex()
+    exact.add_many(vectors)
+    exact_top, p50, p95 = run_queries(exact, queries, args.top_k, None)
+    exact_threshold, threshold_p50, _ = run_queries(exact, queries, args.top_k, args.threshold)
+    exact_bytes = exact.vectors.nbytes
+
+    # Full-precision rows come from a side matrix, as they would from the memory-mapped store
+    full_precision = VectorIndex.normalize(vectors)
+
+    print(f"{'mode':>8} {'rerank':>7} {'recall':>8} {'thr agree':>10} {'p50 ms':>9} {'p95 ms':>9} {'thr p50 ms':>11} {'resident MB':>12}")
+    print(f"{'float32':>8} {'-':>7} {1.0:>8.3f} {1.0:>10.3f} {p50:>9.3f} {p95:>9.3f} {threshold_p50:>11.3f} {exact_bytes / 2**20:>12.1f}")
+    for mode in QuantizedIndex.MODES:
+        index = QuantizedIndex(mode, full_precision_source=lambda rows: full_precision[rows])
+        index.add_many(vectors)
+        for rerank_size in args.rerank:
+            index.rerank_size = rerank_size
+            top, p50, p95 = run_queries(index, queries, args.top_k, None)
+            # With a threshold the shortlist grows until no skipped row can pass it
+            thresholded, threshold_p50, _ = run_queries(index, queries, args.top_k, args.threshold)
+            top_recall = recall([[row for row, _ in r] for r in exact_top], [[row for row, _ in r] for r in top])
+            agreement = threshold_agreement(exact_threshold, thresholded)
+            print(f"{mode:>8} {rerank_size:>7} {top_recall:>8.3f} {agreement:>10.3f} {p50:>9.3f} {p95:>9.3f} {threshold_p50:>11.3f} {index.resident_bytes() / 2**20:>12.1f}")
+
+if __name__ == "__main__":
+    main()
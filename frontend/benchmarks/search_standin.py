@@ -0,0 +1,167 @@
+import os
+import sys
+import glob
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from llm_backend import fake_embedding
+
+FIXTURES_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that stop reading early reset the connection; that is expected here
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+class StandInServer:
+    def __init__(self, fixtures_folder: str = FIXTURES_FOLDER, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0,
+                 embed_latency: float = 0.0, dimension: int = 768, seed: int = 0):
+        self.pages = []
+        for path in sorted(glob.glob(os.path.join(fixtures_folder, "*.html"))):
+            with open(path, "rb") as file:
+                self.pages.append(file.read())
+        if not self.pages:
+            raise ValueError(f"No fixture pages in {fixtures_folder}")
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.embed_latency = embed_latency
+        self.dimension = dimension
+        self.stats = {"searches": 0, "failures": 0, "embed_requests": 0, "embedded_texts": 0, "connections": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _QuietServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def search_url(self) -> str:
+        return f"{self.url}/html/"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _search_delay(self) -> float:
+        with self._lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.failure_rate
+
+    def _page_for(self, query: str) -> bytes:
+        return self.pages[int(hashlib.md5(query.encode("utf-8")).hexdigest(), 16) % len(self.pages)]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.stats["connections"] += 1
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Early-exit parsers close the connection before the page ends
+                    self.close_connection = True
+
+            def _search(self, query: str):
+                time.sleep(server._search_delay())
+                with server._lock:
+                    server.stats["searches"] += 1
+                if server._should_fail():
+                    with server._lock:
+                        server.stats["failures"] += 1
+                    self._send(503, b"Service Unavailable", "text/plain")
+                    return
+                self._send(200, server._page_for(query), "text/html; charset=UTF-8")
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                if parsed.path.rstrip("/") == "/html":
+                    self._search(parse_qs(parsed.query).get("q", [""])[0])
+                else:
+                    self._send(404, b"Not Found", "text/plain")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length) if length else b""
+                parsed = urlparse(self.path)
+                if parsed.path.rstrip("/") == "/html":
+                    self._search(parse_qs(body.decode("utf-8")).get("q", [""])[0])
+                    return
+                if parsed.path not in ("/api/embed", "/api/embeddings"):
+                    self._send(404, b"Not Found", "text/plain")
+                    return
+
+                request = json.loads(body or b"{}")
+                texts = request.get("input", request.get("prompt", ""))
+                texts = [texts] if isinstance(texts, str) else texts
+                time.sleep(server.embed_latency)
+                with server._lock:
+                    server.stats["embed_requests"] += 1
+                    server.stats["embedded_texts"] += len(texts)
+                embeddings = [fake_embedding(text, server.dimension) for text in texts]
+                if parsed.path == "/api/embed":
+                    response = {"model": request.get("model", ""), "embeddings": embeddings}
+                else:
+                    response = {"embedding": embeddings[0]}
+                self._send(200, json.dumps(response).encode("utf-8"), "application/json")
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Local DuckDuckGo HTML and Ollama embedding stand-in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=FIXTURES_FOLDER)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds added to every search")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--embed-latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    server = StandInServer(args.fixtures, port=args.port, latency=args.latency, jitter=args.jitter,
+                           failure_rate=args.failure_rate, embed_latency=args.embed_latency)
+    print(f"Search: {server.search_url}  Ollama host: {server.url}")
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
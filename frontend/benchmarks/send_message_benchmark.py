@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from chat_logic import ChatLogic
+from memory_handler import MemoryHandler
+from llm_backend import FakeBackend
+from rate_limiter import RateLimiter
+from search_standin import StandInServer, FIXTURES_FOLDER
+
+TOPICS = ["python", "база", "данных", "заметки", "проект", "сервер", "поиск", "индекс", "память",
+          "модель", "синхронизация", "файл", "запрос", "кэш", "очередь", "отпуск", "книга", "музыка"]
+
+def sentence(generator: random.Random, words: int) -> str:
+    return " ".join(generator.choice(TOPICS) for _ in range(words))
+
+def write_notes(folder: str, count: int, seed: int):
+    generator = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    for index in range(count):
+        sections = [f"## {sentence(generator, 3)}\n\n{sentence(generator, 60)}\n" for _ in range(3)]
+        with open(os.path.join(folder, f"note_{index:04d}.md"), "w", encoding="utf-8") as file:
+            file.write(f"# Заметка {index}\n\n" + "\n".join(sections))
+
+def seed_memory(summaries: int, interval: int, seed: int):
+    # Summaries are produced by the fake backend without delays, before the timed run
+    generator = random.Random(seed)
+    handler = MemoryHandler(backend=FakeBackend())
+    for _ in range(summaries * interval):
+        handler.add_message(sentence(generator, 12), sentence(generator, 30))
+    handler.finalize()
+    handler.embedding_service.close()
+
+def make_backend(args) -> FakeBackend:
+    return FakeBackend(latency=args.latency, prompt_token_latency=args.prompt_token_latency,
+                       token_latency=args.token_latency, embed_latency=args.embed_latency,
+                       reply_tokens=args.reply_tokens)
+
+def run_configuration(args, server, files: bool, web: bool, memory: bool):
+    # Every configuration starts from an empty data folder, since ChatLogic keeps its state in ./data
+    folder = tempfile.mkdtemp(prefix="send_message_benchmark_")
+    previous = os.getcwd()
+    os.chdir(folder)
+    try:
+        if memory:
+            seed_memory(args.summaries, 4, args.seed)
+        backend = make_backend(args)
+        chat_logic = ChatLogic(warm_up=False, backend=backend)
+        if files:
+            notes_folder = os.path.join(folder, "notes")
+            write_notes(notes_folder, args.notes, args.seed)
+            chat_logic.file_handler.save_local_folder(notes_folder)
+            chat_logic.file_handler.index_ready.wait(300)
+            chat_logic.toggle_file_mode(True)
+        if web:
+            chat_logic.web_search_handler.search_url = server.search_url
+            chat_logic.web_search_handler.rate_limiter = RateLimiter(rate=1000.0, capacity=1000.0)
+            chat_logic.web_search_handler.toggle_enabled(True)
+
+        generator = random.Random(args.seed + 1)
+        timings, retrieval, prompt_tokens = [], [], []
+        evaluated_before = backend.stats["evaluated_tokens"]
+        for index in range(args.messages):
+            question = f"{sentence(generator, 8)} {index}?"
+            started = time.perf_counter()
+            chat_logic.send_message(question)
+            timings.append((time.perf_counter() - started) * 1000)
+            retrieval.append(chat_logic.retrieval.last_timings.get("total", 0.0) * 1000)
+            prompt_tokens.append(chat_logic.last_prompt_report.get("prompt_tokens", 0))
+        evaluated = (backend.stats["evaluated_tokens"] - evaluated_before) / args.messages
+        chat_logic.finalize()
+        return {
+            "p50": np.percentile(timings, 50),
+            "p95": np.percentile(timings, 95),
+            "retrieval_p50": np.percentile(retrieval, 50),
+            "prompt_tokens": np.mean(prompt_tokens),
+            "evaluated_tokens": evaluated
+        }
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(folder, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end ChatLogic.send_message benchmark on a fake model backend")
+    parser.add_argument("--messages", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05, help="fixed seconds per model request")
+    parser.add_argument("--prompt-token-latency", type=float, default=0.0002,
+                        help="seconds per prompt token outside the cached prefix")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="seconds per generated token")
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--reply-tokens", type=int, default=48)
+    parser.add_argument("--notes", type=int, default=200)
+    parser.add_argument("--summaries", type=int, default=100)
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    parser.add_argument("--fixtures", default=FIXTURES_FOLDER)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    configurations = [
+        ("chat only", False, False, False),
+        ("memory", False, False, True),
+        ("files", True, False, False),
+        ("web", False, True, False),
+        ("files + web + memory", True, True, True)
+    ]
+    server = StandInServer(args.fixtures, latency=args.search_latency, seed=args.seed).start()
+    try:
+        print(f"send_message latency over {args.messages} messages")
+        print(f"{'configuration':>22} {'p50 ms':>9} {'p95 ms':>9} {'retrieval p50':>14} {'prompt tok':>11} {'evaluated':>10}")
+        for label, files, web, memory in configurations:
+            result = run_configuration(args, server, files, web, memory)
+            print(f"{label:>22} {result['p50']:>9.1f} {result['p95']:>9.1f} {result['retrieval_p50']:>14.1f} "
+                  f"{result['prompt_tokens']:>11.0f} {result['evaluated_tokens']:>10.0f}")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from embedding_service import EmbeddingService
+from web_search import WebSearchHandler
+from rate_limiter import RateLimiter
+from search_standin import StandInServer, FIXTURES_FOLDER
+
+def make_handler(server: StandInServer, data_folder: str, max_results: int = 3,
+                 rate: float = 1000.0, capacity: float = 1000.0) -> WebSearchHandler:
+    # Each scenario gets fresh caches so searches and embeddings really go over HTTP
+    folder = tempfile.mkdtemp(dir=data_folder)
+    service = EmbeddingService(data_folder=folder, memory_cache_size=0, host=server.url)
+    handler = WebSearchHandler(embedding_service=service, search_url=server.search_url, data_folder=folder)
+    handler.enabled = True
+    handler.max_results = max_results
+    handler.rate_limiter = RateLimiter(rate=rate, capacity=capacity)
+    return handler
+
+def close_handler(handler: WebSearchHandler):
+    handler.close()
+    handler.embedding_service.close()
+
+def timed_search(handler: WebSearchHandler, query: str):
+    started = time.perf_counter()
+    results, _, _ = handler.perform_search(query)
+    return (time.perf_counter() - started) * 1000, len(results)
+
+def latency(server, data_folder, queries, max_results):
+    handler = make_handler(server, data_folder, max_results)
+    measurements = [timed_search(handler, query) for query in queries]
+    close_handler(handler)
+    timings = [elapsed for elapsed, _ in measurements]
+    return np.percentile(timings, 50), np.percentile(timings, 95), np.mean([count for _, count in measurements])
+
+def throughput(server, data_folder, queries, workers):
+    handler = make_handler(server, data_folder)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        timings = [elapsed for elapsed, _ in executor.map(lambda query: timed_search(handler, query), queries)]
+    total = time.perf_counter() - started
+    close_handler(handler)
+    return len(queries) / total, np.percentile(timings, 95)
+
+def rate_limited(server, data_folder, queries, rate, capacity):
+    handler = make_handler(server, data_folder, rate=rate, capacity=capacity)
+    started = time.perf_counter()
+    for query in queries:
+        handler.perform_search(query)
+    total = time.perf_counter() - started
+    close_handler(handler)
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline WebSearchHandler benchmark against a local DuckDuckGo stand-in")
+    parser.add_argument("--fixtures", default=FIXTURES_FOLDER)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in search latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--embed-latency", type=float, default=0.005)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--max-results", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--burst-queries", type=int, default=4)
+    args = parser.parse_args()
+
+    server = StandInServer(args.fixtures, latency=args.latency, jitter=args.jitter,
+                           failure_rate=args.failure_rate, embed_latency=args.embed_latency).start()
+    data_folder = tempfile.mkdtemp(prefix="web_search_benchmark_")
+    queries = [f"benchmark query {index}" for index in range(args.queries)]
+    try:
+        print("End-to-end perform_search latency")
+        print(f"{'max_results':>12} {'p50 ms':>9} {'p95 ms':>9} {'results':>8}")
+        for max_results in args.max_results:
+            p50, p95, count = latency(server, data_folder, queries, max_results)
+            print(f"{max_results:>12} {p50:>9.1f} {p95:>9.1f} {count:>8.1f}")
+
+        print("\nThroughput under concurrent queries")
+        print(f"{'workers':>12} {'queries/s':>10} {'p95 ms':>9}")
+        for workers in args.workers:
+            qps, p95 = throughput(server, data_folder, queries, workers)
+            print(f"{workers:>12} {qps:>10.1f} {p95:>9.1f}")
+
+        print(f"\nRate limiting, {args.burst_queries} back-to-back queries")
+        print(f"{'limiter':>24} {'total s':>9}")
+        burst = queries[:args.burst_queries]
+        for label, rate, capacity in [("none", 1000.0, 1000.0), ("0.5/s, burst 1", 0.5, 1), ("0.5/s, burst 3", 0.5, 3)]:
+            print(f"{label:>24} {rate_limited(server, data_folder, burst, rate, capacity):>9.2f}")
+        print(f"\nStand-in stats: {server.stats}")
+    finally:
+        server.stop()
+        shutil.rmtree(data_folder, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
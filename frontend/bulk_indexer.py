@@ -0,0 +1,133 @@
+import time
+from collections import deque
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional
+from markdown_index import MarkdownIndex
+
+class BulkIndexer:
+    def __init__(self, markdown_index: MarkdownIndex, read_workers: int = 4,
+                 embed_workers: int = 2, batch_files: int = 16, progress_interval: float = 0.5):
+        self.markdown_index = markdown_index
+        self.read_workers = read_workers
+        self.embed_workers = embed_workers
+        self.batch_files = batch_files
+        self.progress_interval = progress_interval
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def run(self, file_paths: List[str],
+            progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict[str, int]:
+        self._cancel_event.clear()
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0}
+        # Every finished file is committed to indexed_files, so a rerun after an interruption
+        # only sees the files that were not stored yet
+        candidates, missing, counts["unchanged"] = self.markdown_index.find_changes(file_paths)
+        progress = {
+            "total": len(candidates),
+            "done": 0,
+            "files_per_sec": 0.0,
+            "eta": None,
+            "skipped": counts["unchanged"],
+            "finished": False
+        }
+        started = time.monotonic()
+        last_report = 0.0
+
+        def report(force: bool = False):
+            nonlocal last_report
+            now = time.monotonic()
+            if progress_callback is None or (not force and now - last_report < self.progress_interval):
+                return
+            last_report = now
+            elapsed = max(now - started, 1e-6)
+            progress["files_per_sec"] = progress["done"] / elapsed
+            remaining = progress["total"] - progress["done"]
+            progress["eta"] = remaining / progress["files_per_sec"] if progress["files_per_sec"] else None
+            try:
+                progress_callback(dict(progress))
+            except Exception as e:
+                print(f"Indexing progress callback error: {str(e)}")
+
+        report(force=True)
+        with ThreadPoolExecutor(max_workers=self.read_workers) as readers, \
+                ThreadPoolExecutor(max_workers=self.embed_workers) as embedders:
+            # Reads run at most a few batches ahead of embedding, so a large vault is never
+            # held in memory all at once
+            read_window = self.batch_files * self.embed_workers * 2
+            remaining = iter(candidates)
+            reads = deque()
+
+            def read_ahead():
+                while len(reads) < read_window:
+                    candidate = next(remaining, None)
+                    if candidate is None:
+                        return
+                    reads.append(readers.submit(self.markdown_index.prepare_file, *candidate))
+
+            in_flight = set()
+            future_batches = {}
+            batch = []
+
+            def finish(futures):
+                for future in futures:
+                    prepared_batch = future_batches.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        print(f"Markdown indexing error: {str(e)}")
+                        results = [False] * len(prepared_batch)
+                    for prepared, indexed in zip(prepared_batch, results):
+                        if indexed:
+                            counts["updated" if prepared["existed"] else "added"] += 1
+                        else:
+                            counts["failed"] += 1
+                    progress["done"] += len(prepared_batch)
+                report()
+
+            def submit(prepared_batch):
+                nonlocal in_flight
+                # Bound the number of embedding batches waiting on the server
+                while len(in_flight) >= self.embed_workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    finish(done)
+                future = embedders.submit(self.markdown_index.index_files, prepared_batch)
+                future_batches[future] = prepared_batch
+                in_flight.add(future)
+
+            read_ahead()
+            while reads:
+                prepared = reads.popleft().result()
+                read_ahead()
+                if self._cancel_event.is_set():
+                    readers.shutdown(wait=False, cancel_futures=True)
+                    break
+                if prepared is None:
+                    counts["unchanged"] += 1
+                    progress["done"] += 1
+                    report()
+                    continue
+                if not prepared:
+                    counts["failed"] += 1
+                    progress["done"] += 1
+                    report()
+                    continue
+                batch.append(prepared)
+                if len(batch) >= self.batch_files:
+                    submit(batch)
+                    batch = []
+            if batch and not self._cancel_event.is_set():
+                submit(batch)
+            finish(wait(in_flight).done)
+
+        if not self._cancel_event.is_set():
+            counts["removed"] = self.markdown_index.remove_missing(file_paths, missing)
+            progress["finished"] = True
+        report(force=True)
+        return counts
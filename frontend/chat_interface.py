@@ -2,13 +2,17 @@ from PySide6.QtWidgets import (QMainWindow, QTextEdit, QLineEdit, QPushButton,
                               QVBoxLayout, QWidget, QMessageBox, QFileDialog,
                               QInputDialog, QLabel, QApplication)
 from PySide6.QtUiTools import QUiLoader
-from PySide6.QtCore import (QFile, Qt)
+from PySide6.QtCore import (QFile, Qt, Signal, QThreadPool)
+from PySide6.QtGui import QTextCursor, QKeySequence, QShortcut
 from chat_logic import ChatLogic
 from sync_handler import SyncHandler
-from memory_handler import MemoryHandler
+from workers import Worker
 import os
 
 class ChatInterface(QMainWindow):
+    index_progress = Signal(dict)
+    models_ready = Signal(bool)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Chat with Ai")
@@ -25,7 +29,20 @@ class ChatInterface(QMainWindow):
         self.setCentralWidget(self.ui)
 
         self.chat_logic = ChatLogic()
+        self.models_label = QLabel("Models: loading...")
+        self.statusBar().addPermanentWidget(self.models_label)
+        self.models_ready.connect(self.show_models_ready)
+        self.chat_logic.warmup_callback = self.models_ready.emit
+        if not self.chat_logic.warm_up:
+            self.models_label.hide()
+        elif self.chat_logic.warmup_done.is_set():
+            self.show_models_ready(self.chat_logic.warmup_ok)
         self.sync_handler = SyncHandler()
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(3)
+        self.active_workers = set()
+        self.reply_worker = None
+        self.sync_worker = None
 
         self.chat_display = self.ui.findChild(QTextEdit, "chatDisplay")
         self.user_input_entry = self.ui.findChild(QLineEdit, "userInputEntry")
@@ -51,6 +68,7 @@ class ChatInterface(QMainWindow):
         self.upload_button.clicked.connect(self.handle_upload)
         self.download_button.clicked.connect(self.handle_download)
         self.logout_button.clicked.connect(self.handle_logout)
+        QShortcut(QKeySequence(Qt.Key_Escape), self, self.cancel_reply)
 
         self.file_mode_button.setCheckable(True)
         self.file_mode_button.setText("Enable File Mode")
@@ -59,6 +77,10 @@ class ChatInterface(QMainWindow):
         self.update_auth_ui(False)
         self.username_label.clear()
 
+        # Indexing runs on a background thread, so progress reaches the UI through a queued signal
+        self.index_progress.connect(self.show_index_progress)
+        self.chat_logic.file_handler.progress_callback = self.index_progress.emit
+
         if not self.chat_logic.file_handler.local_folder:
             self.prompt_local_folder()
 
@@ -92,18 +114,59 @@ class ChatInterface(QMainWindow):
         self.download_button.setEnabled(logged_in)
         self.logout_button.setEnabled(logged_in)
 
+    def start_worker(self, worker, on_result=None, on_finished=None):
+        self.active_workers.add(worker)
+        if on_result is not None:
+            worker.signals.result.connect(on_result)
+        worker.signals.error.connect(lambda message: QMessageBox.warning(self, "Error", message))
+
+        def finished():
+            self.active_workers.discard(worker)
+            if on_finished is not None:
+                on_finished()
+        worker.signals.finished.connect(finished)
+        self.thread_pool.start(worker)
+        return worker
+
+    def show_models_ready(self, ok):
+        self.models_label.setText("Models: ready" if ok else "Models: warm-up failed")
+
     def send_message(self):
         user_input = self.user_input_entry.text()
-        if not user_input.strip():
+        if not user_input.strip() or self.reply_worker is not None:
             return
 
         self.chat_display.append(f"You: {user_input}")
+        self.user_input_entry.clear()
+
+        self.chat_display.append("Ai: ")
+        self.send_button.setEnabled(False)
+        if self.chat_logic.warm_up and not self.chat_logic.warmup_done.is_set():
+            self.statusBar().showMessage("Waiting for models to load... (Esc to stop)")
+        else:
+            self.statusBar().showMessage("Generating reply... (Esc to stop)")
+        self.reply_worker = Worker(self.chat_logic.stream_message, user_input, stream=True)
+        self.reply_worker.signals.chunk.connect(self.append_to_reply)
+        self.start_worker(self.reply_worker, on_finished=self.finish_reply)
 
-        ai_reply = self.chat_logic.send_message(user_input)
-        if ai_reply:
-            self.chat_display.append(f"Ai: {ai_reply}\n")
+    def finish_reply(self):
+        if self.reply_worker is not None and self.reply_worker.cancelled:
+            self.append_to_reply(" [остановлено]")
+        self.reply_worker = None
+        self.chat_display.append("")
+        self.send_button.setEnabled(True)
+        self.statusBar().clearMessage()
 
-        self.user_input_entry.clear()
+    def cancel_reply(self):
+        if self.reply_worker is not None:
+            self.reply_worker.cancel()
+
+    def append_to_reply(self, text):
+        cursor = self.chat_display.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self.chat_display.setTextCursor(cursor)
+        self.chat_display.ensureCursorVisible()
 
     def toggle_file_mode(self):
         enabled = self.file_mode_button.isChecked()
@@ -121,10 +184,23 @@ class ChatInterface(QMainWindow):
         folder_path = QFileDialog.getExistingDirectory(self, "Select Local Folder")
         if folder_path:
             self.chat_logic.file_handler.save_local_folder(folder_path)
+            self.statusBar().showMessage("Indexing notes...")
             QMessageBox.information(self, "Success", f"Local folder set to: {folder_path}")
         else:
             QMessageBox.warning(self, "Warning", "Local folder is required for file mode.")
 
+    def show_index_progress(self, progress):
+        if progress["finished"]:
+            self.statusBar().showMessage(f"Notes indexed: {progress['total'] + progress['skipped']} files", 5000)
+            return
+        message = f"Indexing notes: {progress['done']}/{progress['total']} files"
+        if progress["files_per_sec"]:
+            message += f", {progress['files_per_sec']:.1f} files/s"
+        if progress["eta"] is not None:
+            minutes, seconds = divmod(int(progress["eta"]), 60)
+            message += f", ETA {minutes}:{seconds:02d}"
+        self.statusBar().showMessage(message)
+
     def handle_register(self):
         username, ok1 = QInputDialog.getText(self, "Register", "Username:")
         if not ok1 or not username:
@@ -148,35 +224,12 @@ class ChatInterface(QMainWindow):
         else:
             QMessageBox.information(self, "Success", "Registration successful. You can now login.")
 
-    def handle_upload(self):
-        if not self.sync_handler.auth_token:
-            QMessageBox.warning(self, "Error", "You need to login first")
-            return
-            
-        result = self.sync_handler.upload_data()
-        if "error" in result:
-            QMessageBox.warning(self, "Upload Failed", result["error"])
-        else:
-            QMessageBox.information(self, "Success", "Data uploaded to cloud successfully")
-
-    def handle_download(self):
-        if not self.sync_handler.auth_token:
-            QMessageBox.warning(self, "Error", "You need to login first")
-            return
-            
-        result = self.sync_handler.download_data()
-        if "error" in result:
-            QMessageBox.warning(self, "Download Failed", result["error"])
-        else:
-            success = self.sync_handler.save_downloaded_data(result)
-            if success:
-                QMessageBox.information(self, "Success", "Data downloaded from cloud successfully")
-                self.chat_logic.memory_handler = MemoryHandler()
-            else:
-                QMessageBox.warning(self, "Error", "Failed to save downloaded data")
-
     def closeEvent(self, event):
         try:
+            for worker in list(self.active_workers):
+                worker.cancel()
+            # Let running jobs reach a safe point before the handlers are closed underneath them
+            self.thread_pool.waitForDone(5000)
             self.chat_logic.finalize()
             event.accept()
         except Exception as e:
@@ -187,60 +240,76 @@ class ChatInterface(QMainWindow):
         if not self.sync_handler.auth_token:
             QMessageBox.warning(self, "Error", "You need to login first")
             return
-        
-        self.setCursor(Qt.WaitCursor)
-        try:
-            result = self.sync_handler.download_data()
-            
-            if "error" in result:
-                QMessageBox.warning(self, "Download Failed", 
-                    f"{result['error']}\nDetails: {result.get('details', 'None')}")
-            elif not result.get('data'):
-                reply = QMessageBox.question(
-                    self,
-                    "Empty Cloud Storage",
-                    "The cloud has no chat data. Do you want to clear local data?",
-                    QMessageBox.Yes | QMessageBox.No
-                )
-                if reply == QMessageBox.Yes:
-                    summary_path = os.path.join("data", "chat_summary.jsonl")
-                    embeddings_path = os.path.join("data", "chat_embeddings.jsonl")
-                    
-                    with open(summary_path, "w", encoding="utf-8") as f:
-                        f.write("")
-                    with open(embeddings_path, "w", encoding="utf-8") as f:
-                        f.write("")
-                    
-                    self.chat_logic.memory_handler = MemoryHandler()
-                    QMessageBox.information(self, "Success", "Local data cleared")
-            else:
-                success = self.sync_handler.save_downloaded_data(result)
-                if success:
-                    self.chat_logic.memory_handler = MemoryHandler()
-                    QMessageBox.information(self, "Success", 
-                        f"Downloaded {len(result['data'])} conversation records")
-                else:
-                    QMessageBox.warning(self, "Error", "Failed to save downloaded data")
-        finally:
-            self.setCursor(Qt.ArrowCursor)
+
+        self.start_sync(self.download, self.downloaded)
+
+    def download(self):
+        # Fetching and saving run in one job, so the sync buttons stay disabled until both are done
+        result = self.sync_handler.download_data()
+        if "error" in result or not result.get('data'):
+            return result
+        if not self.sync_handler.save_downloaded_data(result):
+            return {"error": "Failed to save downloaded data"}
+        self.chat_logic.memory_handler.reload_history()
+        return {"records": len(result['data'])}
+
+    def downloaded(self, result):
+        if "error" in result:
+            QMessageBox.warning(self, "Download Failed",
+                f"{result['error']}\nDetails: {result.get('details', 'None')}")
+        elif "records" in result:
+            QMessageBox.information(self, "Success", f"Downloaded {result['records']} conversation records")
+        else:
+            reply = QMessageBox.question(
+                self,
+                "Empty Cloud Storage",
+                "The cloud has no chat data. Do you want to clear local data?",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if reply == QMessageBox.Yes:
+                # Clearing waits for pending summaries, so it runs off the GUI thread as well
+                self.start_sync(self.chat_logic.memory_handler.clear_history,
+                                lambda _: QMessageBox.information(self, "Success", "Local data cleared"))
 
     def handle_upload(self):
         if not self.sync_handler.auth_token:
             QMessageBox.warning(self, "Error", "You need to login first")
             return
-        
-        self.setCursor(Qt.WaitCursor)
-        QApplication.processEvents()
-        
-        try:
-            if not self.chat_logic.memory_handler.force_summary():
-                QMessageBox.warning(self, "Warning", "Failed to summarize pending messages")
-                return
-            
-            result = self.sync_handler.upload_data()
-            if "error" in result:
-                QMessageBox.warning(self, "Upload Failed", result["error"])
-            else:
-                QMessageBox.information(self, "Success", "Data uploaded to cloud successfully")
-        finally:
-            self.setCursor(Qt.ArrowCursor)
\ No newline at end of file
+
+        self.start_sync(self.upload, self.uploaded)
+
+    def upload(self):
+        if not self.chat_logic.memory_handler.force_summary():
+            return {"warning": "Failed to summarize pending messages"}
+        return self.sync_handler.upload_data(
+            self.chat_logic.memory_handler.load_summaries_and_embeddings()
+        )
+
+    def uploaded(self, result):
+        if "warning" in result:
+            QMessageBox.warning(self, "Warning", result["warning"])
+        elif "error" in result:
+            QMessageBox.warning(self, "Upload Failed", result["error"])
+        else:
+            QMessageBox.information(self, "Success", "Data uploaded to cloud successfully")
+
+    def start_sync(self, function, on_result):
+        # A result slot may start the next sync job; the buttons come back only when the last one ends
+        self.set_sync_busy(True)
+        worker = Worker(function)
+        self.sync_worker = worker
+        self.start_worker(worker, on_result, lambda: self.finish_sync(worker))
+
+    def finish_sync(self, worker):
+        if self.sync_worker is worker:
+            self.sync_worker = None
+            self.set_sync_busy(False)
+
+    def set_sync_busy(self, busy):
+        self.upload_button.setEnabled(not busy and self.sync_handler.auth_token is not None)
+        self.download_button.setEnabled(not busy and self.sync_handler.auth_token is not None)
+        self.logout_button.setEnabled(not busy and self.sync_handler.auth_token is not None)
+        if busy:
+            self.setCursor(Qt.BusyCursor)
+        else:
+            self.setCursor(Qt.ArrowCursor)
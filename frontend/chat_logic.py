@@ -1,20 +1,79 @@
 import os
 import json
 from datetime import datetime
-import ollama
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 from file_handler import FileHandler
 from web_search import WebSearchHandler
 from memory_handler import MemoryHandler
+from embedding_service import EmbeddingService
+from llm_backend import ModelBackend, OllamaBackend
+from retrieval import RetrievalStage
+from prompt_builder import PromptBuilder
 
 class ChatLogic:
-    def __init__(self):
+    def __init__(self, warm_up: bool = True, backend: Optional[ModelBackend] = None):
         self.current_conversation = []
         self._init_conversation()
-        self.file_handler = FileHandler()
-        self.web_search_handler = WebSearchHandler()
-        self.memory_handler = MemoryHandler()
+        # How long Ollama keeps llama3 loaded between turns; unloading drops its prefill cache too
+        self.keep_alive = "30m"
+        self.backend = backend or OllamaBackend()
+        self.embedding_service = EmbeddingService(keep_alive=self.keep_alive, backend=self.backend)
+        self.warm_up = warm_up
+        self.warmup_timeout = 180
+        self.warmup_done = threading.Event()
+        self.warmup_ok = False
+        self.warmup_callback = None
+        self._warmup_thread = None
+        # Built before the warm-up, which loads llama3 with the same num_ctx as the chat requests
+        self.prompt_builder = PromptBuilder(context_window=8192)
+        # Started first so the models load while the indexes below and the window are built
+        self.start_warmup()
+        self.file_handler = FileHandler(embedding_service=self.embedding_service)
+        self.web_search_handler = WebSearchHandler(embedding_service=self.embedding_service)
+        self.memory_handler = MemoryHandler(
+            embedding_service=self.embedding_service, backend=self.backend,
+            keep_alive=self.keep_alive, num_ctx=self.prompt_builder.context_window
+        )
+        self.retrieval = RetrievalStage(self.embedding_service)
+        self.max_history_messages = 20
+        self.last_prompt_report = {}
+        self.measure_prefill = False
+        self.last_prefill = {}
         self.file_mode_enabled = False
 
+    def start_warmup(self):
+        # Loads llama3 and the embedding model in the background; warmup_callback(ok) runs on that thread
+        if not self.warm_up or self._warmup_thread is not None:
+            return
+        self.warmup_done.clear()
+
+        def run():
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                results = list(executor.map(lambda warm: warm(), [self._warm_chat_model, self.embedding_service.warm_up]))
+            self.warmup_ok = all(results)
+            self.warmup_done.set()
+            if self.warmup_callback is not None:
+                self.warmup_callback(self.warmup_ok)
+
+        self._warmup_thread = threading.Thread(target=run, daemon=True)
+        self._warmup_thread.start()
+
+    def _warm_chat_model(self):
+        try:
+            # Ollama reloads the runner when num_ctx changes, so the options match _chat_options()
+            self.backend.chat(model="llama3", messages=[], options=self._chat_options(), keep_alive=self.keep_alive)
+            return True
+        except Exception as e:
+            print(f"Chat model warm-up error: {str(e)}")
+            return False
+
+    def wait_for_warmup(self):
+        # A message sent during warm-up waits for the load in progress instead of starting another one
+        if self._warmup_thread is not None and not self.warmup_done.is_set():
+            self.warmup_done.wait(self.warmup_timeout)
+
     def _init_conversation(self):
         self.current_conversation = []
 
@@ -42,89 +101,179 @@ class ChatLogic:
         return {"role": "system", "content": system_message}
 
     def get_embedding(self, text):
+        return self.embedding_service.get_embedding(text)
+
+    def find_relevant_context(self, user_input, query_embedding=None):
         try:
-            response = ollama.embeddings(model='nomic-embed-text', prompt=text)
-            return response['embedding']
+            return self.memory_handler.find_relevant_context(
+                user_input, max_results=2, query_embedding=query_embedding
+            )
         except Exception as e:
-            print(f"Embedding error: {str(e)}")
+            print(f"Context error: {str(e)}")
             return []
 
-    def find_relevant_context(self, user_input):
+    def find_lexical_context(self, user_input):
+        # Used when the query embedding is late because Ollama is busy generating
         try:
-            memory_context = self.memory_handler.find_relevant_context(user_input, max_results=2)
-            return [
-                f"- Из итога беседы ({m['start_timestamp']} - {m['end_timestamp']}): '{m['summary']}'"
-                for m in memory_context
-            ]
+            return self.memory_handler.find_relevant_context(user_input, max_results=2, lexical_only=True)
         except Exception as e:
             print(f"Context error: {str(e)}")
             return []
 
+    def _prepare_messages(self, user_input):
+        self.wait_for_warmup()
+        self.current_conversation.append({
+            "role": "user",
+            "content": user_input
+        })
+
+        # The prompt builder decides how much history fits; this only bounds what is kept around.
+        # The oldest half goes at once, so the rest stays a stable prompt prefix for many turns.
+        if len(self.current_conversation) > self.max_history_messages:
+            keep = self.max_history_messages // 2
+            if self.current_conversation[-keep]["role"] != "user":
+                keep += 1
+            self.current_conversation = self.current_conversation[-keep:]
+
+        sources = {"memory": self.find_relevant_context}
+        if self.file_mode_enabled:
+            sources["files"] = self.file_handler.find_relevant_markdown_content
+        if self.web_search_handler.enabled:
+            sources["web"] = self._search_web
+        retrieved = self.retrieval.run(user_input, sources, {"memory": self.find_lexical_context})
+
+        context_items = []
+        for m in retrieved.get("files", {}).get("value") or []:
+            context_items.append({
+                "source": "files",
+                "score": m["similarity"],
+                "text": f"- Файл: '{m['file_path']}' (строки {m['start_line']}-{m['end_line']})\n  Контент: '{m['content']}'"
+            })
+
+        for m in retrieved["memory"]["value"] or []:
+            context_items.append({
+                "source": "memory",
+                "score": m.get("similarity", m.get("score", 0.0)),
+                "text": f"- Из итога беседы ({m['start_timestamp']} - {m['end_timestamp']}): '{m['summary']}'"
+            })
+
+        if "web" in retrieved:
+            search_results, search_failed, search_wait = retrieved["web"]["value"] or ([], True, 0.0)
+            if search_failed:
+                context_items.append({"source": "notice", "score": None,
+                                      "text": "Внимание: веб-поиск недоступен. Ответ может быть неполным."})
+            elif search_wait:
+                context_items.append({"source": "notice", "score": None,
+                                      "text": f"Веб-поиск временно ограничен, он снова будет доступен через {search_wait:.0f} с. Ответ будет дан без результатов поиска."})
+            elif not search_results:
+                context_items.append({"source": "notice", "score": None,
+                                      "text": "Веб-поиск не дал результатов. Ответ будет дан без дополнительной информации из интернета."})
+            for res in search_results:
+                context_items.append({
+                    "source": "web",
+                    "score": res.get("similarity", 0.0),
+                    "text": f"- {res['title']} ({res['url']}): {res['content']}"
+                    + "".join(f"\n  Фрагмент страницы: {passage}" for passage in res.get('passages', []))
+                })
+
+        system_message = self.generate_system_prompt()
+        context_message, history, self.last_prompt_report = self.prompt_builder.build(
+            system_message,
+            [msg.copy() for msg in self.current_conversation if msg.get("role") != "system"],
+            context_items,
+            [("files", "Контекст из файлов:"), ("memory", "Контекст из истории:"),
+             ("web", "Результаты веб-поиска:"), ("notice", "")]
+        )
+        # History the builder trimmed is forgotten here too, so later turns start from the same message
+        if any(item["source"] == "history" for item in self.last_prompt_report["dropped"]):
+            self.current_conversation = self.current_conversation[-len(history):]
+
+        # System prompt and earlier turns form a prefix that repeats from one turn to the next,
+        # so Ollama can reuse its cached prefill; the per-turn context goes right before the question
+        messages = [system_message] + history[:-1]
+        if context_message:
+            messages.append(context_message)
+        messages.append(history[-1])
+        return messages
+
+    def _chat_options(self):
+        return {"temperature": 0.8, "num_ctx": self.prompt_builder.context_window}
+
+    def _record_prefill(self, response):
+        evaluated = response.get('prompt_eval_count')
+        if evaluated is None:
+            return
+        duration = (response.get('prompt_eval_duration') or 0) / 1e6
+        estimated = self.last_prompt_report.get("prompt_tokens", 0)
+        self.last_prefill = {
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration_ms": duration,
+            "estimated_prompt_tokens": estimated,
+            "reused_tokens_estimate": max(0, estimated - evaluated)
+        }
+        if self.measure_prefill:
+            print(f"Prefill: evaluated {evaluated} of ~{estimated} prompt tokens in {duration:.0f} ms")
+
+    def _search_web(self, user_input, query_embedding):
+        return self.web_search_handler.perform_search(user_input, query_embedding=query_embedding)
+
+    def _finish_reply(self, user_input, ai_reply):
+        self.current_conversation.append({
+            "role": "assistant",
+            "content": ai_reply
+        })
+        self.memory_handler.add_message(user_input, ai_reply)
+
     def send_message(self, user_input):
         try:
             if not user_input.strip():
                 return None
 
-            self.current_conversation.append({
-                "role": "user",
-                "content": user_input
-            })
-
-            max_context_length = 6
-            if len(self.current_conversation) > max_context_length:
-                self.current_conversation = self.current_conversation[-max_context_length:]
-
-            messages = [self.generate_system_prompt()] + [
-                msg.copy() for msg in self.current_conversation if msg.get("role") != "system"
-            ]
-
-            context = []
-            if self.file_mode_enabled:
-                markdown_context = self.file_handler.find_relevant_markdown_content(user_input)
-                if markdown_context:
-                    context.append("Контекст из файлов:\n" + "\n".join(
-                        f"- Файл: '{m['file_path']}'\n  Контент: '{m['content']}'"
-                        for m in markdown_context
-                    ))
-
-            chat_context = self.find_relevant_context(user_input)
-            if chat_context:
-                context.append("Контекст из истории:\n" + "\n".join(chat_context))
-
-            if self.web_search_handler.enabled:
-                search_results = self.web_search_handler.perform_search(user_input)
-                if self.web_search_handler.last_search_failed:
-                    context.append("Внимание: веб-поиск недоступен. Ответ может быть неполным.")
-                elif not search_results:
-                    context.append("Веб-поиск не дал результатов. Ответ будет дан без дополнительной информации из интернета.")
-                else:
-                    context.append("Результаты веб-поиска:\n" + "\n".join(
-                        f"- {res['title']} ({res['url']}): {res['content']}"
-                        for res in search_results
-                    ))
-
-            if context:
-                messages.insert(1, {"role": "system", "content": "\n".join(context)})
-
-            response = ollama.chat(
+            messages = self._prepare_messages(user_input)
+            response = self.backend.chat(
                 model="llama3",
                 messages=messages,
-                options={"temperature": 0.8}
+                options=self._chat_options(),
+                keep_alive=self.keep_alive
             )
+            self._record_prefill(response)
             ai_reply = response['message']['content']
-
-            self.current_conversation.append({
-                "role": "assistant",
-                "content": ai_reply
-            })
-
-            self.memory_handler.add_message(user_input, ai_reply)
+            self._finish_reply(user_input, ai_reply)
             
             return ai_reply
         except Exception as e:
             print(f"Processing error: {str(e)}")
             return "Извините, произошла ошибка. Попробуйте ещё раз."
 
+    def stream_message(self, user_input):
+        # Yields the reply piece by piece; the full reply reaches memory once the stream ends
+        if not user_input.strip():
+            return
+        parts = []
+        try:
+            messages = self._prepare_messages(user_input)
+            for chunk in self.backend.chat(
+                model="llama3",
+                messages=messages,
+                options=self._chat_options(),
+                keep_alive=self.keep_alive,
+                stream=True
+            ):
+                if chunk.get('done'):
+                    self._record_prefill(chunk)
+                content = chunk['message']['content']
+                if content:
+                    parts.append(content)
+                    yield content
+        except Exception as e:
+            print(f"Processing error: {str(e)}")
+            if not parts:
+                yield "Извините, произошла ошибка. Попробуйте ещё раз."
+        finally:
+            # A cancelled or broken stream still records the part the user has already seen
+            if parts:
+                self._finish_reply(user_input, "".join(parts))
+
     def toggle_file_mode(self, enabled: bool):
         self.file_mode_enabled = enabled
         if enabled and not self.file_handler.local_folder:
@@ -132,4 +281,8 @@ class ChatLogic:
         return None
 
     def finalize(self):
+        self.retrieval.close()
         self.memory_handler.finalize()
+        self.file_handler.close()
+        self.web_search_handler.close()
+        self.embedding_service.close()
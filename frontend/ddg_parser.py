@@ -0,0 +1,61 @@
+from lxml import etree
+from typing import Iterable, List, Dict, Union
+
+def _has_class(element, name: str) -> bool:
+    return name in (element.get("class") or "").split()
+
+def _text(element) -> str:
+    return " ".join("".join(element.itertext()).split())
+
+def _extract(body) -> Dict[str, str]:
+    title_elem = None
+    snippet_elem = None
+    for element in body.iter("a", "div", "td"):
+        if title_elem is None and element.tag == "a" and _has_class(element.getparent(), "result__title"):
+            title_elem = element
+        elif snippet_elem is None and _has_class(element, "result__snippet"):
+            snippet_elem = element
+    if title_elem is None or snippet_elem is None:
+        return {}
+    return {
+        "title": _text(title_elem),
+        "url": title_elem.get("href", ""),
+        "content": _text(snippet_elem)
+    }
+
+def parse_results(chunks: Iterable[Union[bytes, str]], limit: int) -> List[Dict[str, str]]:
+    # Feeds the page piece by piece and stops as soon as `limit` complete results are seen,
+    # so the rest of the page is not parsed; the caller may still read it off the connection
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    results = []
+    state = {"body": None}
+
+    def collect() -> bool:
+        for event, element in parser.read_events():
+            if event == "start":
+                if state["body"] is None and _has_class(element, "result__body"):
+                    state["body"] = element
+                continue
+            if element is not state["body"]:
+                continue
+            state["body"] = None
+            result = _extract(element)
+            # Drop finished results and everything before them to keep the partial tree small
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:
+                while element.getprevious() is not None:
+                    del parent[0]
+            if result.get("title") and result.get("url") and result.get("content"):
+                results.append(result)
+                if len(results) >= limit:
+                    return True
+        return False
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        if collect():
+            return results
+    parser.close()
+    collect()
+    return results
@@ -0,0 +1,209 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Optional
+from llm_backend import ModelBackend, OllamaBackend
+
+class EmbeddingService:
+    def __init__(self, model: str = "nomic-embed-text", data_folder: str = "data",
+                 memory_cache_size: int = 2048, disk_cache_size: int = 50000, batch_size: int = 16,
+                 host: Optional[str] = None, keep_alive: Optional[str] = None,
+                 backend: Optional[ModelBackend] = None):
+        self.model = model
+        self.keep_alive = keep_alive
+        self.backend = backend or OllamaBackend(host=host)
+        self.batch_size = batch_size
+        self.batch_supported = True
+        self.data_folder = data_folder
+        os.makedirs(self.data_folder, exist_ok=True)
+        self.cache_file = os.path.join(self.data_folder, "embedding_cache.db")
+        self.memory_cache_size = memory_cache_size
+        self.disk_cache_size = disk_cache_size
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "errors": 0, "evictions": 0}
+        self._memory_cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._open_disk_cache()
+
+    def _open_disk_cache(self):
+        try:
+            self._connection = sqlite3.connect(self.cache_file, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            with self._connection:
+                self._connection.execute("""
+                    CREATE TABLE IF NOT EXISTS embeddings (
+                        model TEXT NOT NULL,
+                        text_hash TEXT NOT NULL,
+                        embedding BLOB NOT NULL,
+                        last_used REAL NOT NULL,
+                        PRIMARY KEY (model, text_hash)
+                    )
+                """)
+                self._connection.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        except Exception as e:
+            print(f"Embedding cache error: {str(e)}")
+            self._connection = None
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_embedding(self, text: str) -> List[float]:
+        key = (self.model, self.text_hash(text))
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        try:
+            response = self.backend.embeddings(model=self.model, prompt=text, keep_alive=self.keep_alive)
+            embedding = response['embedding']
+        except Exception as e:
+            print(f"Embedding error: {str(e)}")
+            with self._lock:
+                self.stats["errors"] += 1
+            return []
+
+        if embedding:
+            self._store(key, embedding)
+        return embedding
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        keys = [(self.model, self.text_hash(text)) for text in texts]
+        results = [self._lookup(key) for key in keys]
+
+        missing = {}
+        for position, (text, key, cached) in enumerate(zip(texts, keys, results)):
+            if cached is None:
+                missing.setdefault(key, (text, []))[1].append(position)
+
+        pending = list(missing.items())
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            embeddings = self._embed_batch([text for _, (text, _) in batch])
+            for (key, (_, positions)), embedding in zip(batch, embeddings):
+                if embedding:
+                    self._store(key, embedding)
+                for position in positions:
+                    results[position] = embedding
+
+        return [embedding or [] for embedding in results]
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if self.batch_supported and len(texts) > 1:
+            try:
+                response = self.backend.embed(model=self.model, input=texts, keep_alive=self.keep_alive)
+                embeddings = response['embeddings']
+                if len(embeddings) == len(texts):
+                    return [list(embedding) for embedding in embeddings]
+            except ConnectionError as e:
+                # Single requests would fail the same way, one connection attempt per text
+                print(f"Batch embedding error: {str(e)}")
+                with self._lock:
+                    self.stats["errors"] += len(texts)
+                return [[] for _ in texts]
+            except Exception as e:
+                print(f"Batch embedding error, falling back to single requests: {str(e)}")
+                # Servers older than the /api/embed endpoint only accept one prompt per call
+                if isinstance(e, AttributeError) or getattr(e, "status_code", None) in (400, 404, 405):
+                    self.batch_supported = False
+
+        embeddings = []
+        for position, text in enumerate(texts):
+            try:
+                response = self.backend.embeddings(model=self.model, prompt=text, keep_alive=self.keep_alive)
+                embeddings.append(response['embedding'])
+            except Exception as e:
+                print(f"Embedding error: {str(e)}")
+                with self._lock:
+                    self.stats["errors"] += 1
+                embeddings.append([])
+                if isinstance(e, ConnectionError):
+                    with self._lock:
+                        self.stats["errors"] += len(texts) - position - 1
+                    embeddings.extend([] for _ in texts[position + 1:])
+                    break
+        return embeddings
+
+    def warm_up(self) -> bool:
+        # An empty request makes Ollama load the model without embedding anything
+        try:
+            self.backend.embed(model=self.model, input=[], keep_alive=self.keep_alive)
+            return True
+        except Exception as e:
+            print(f"Embedding model warm-up error: {str(e)}")
+            return False
+
+    def _lookup(self, key) -> Optional[List[float]]:
+        with self._lock:
+            if key in self._memory_cache:
+                self._memory_cache.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._memory_cache[key]
+
+            if self._connection is not None:
+                try:
+                    row = self._connection.execute(
+                        "SELECT embedding FROM embeddings WHERE model = ? AND text_hash = ?", key
+                    ).fetchone()
+                    if row:
+                        with self._connection:
+                            self._connection.execute(
+                                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                                (time.time(), *key)
+                            )
+                        embedding = np.frombuffer(row[0], dtype=np.float32).tolist()
+                        self._remember(key, embedding)
+                        self.stats["disk_hits"] += 1
+                        return embedding
+                except Exception as e:
+                    print(f"Embedding cache error: {str(e)}")
+
+            self.stats["misses"] += 1
+            return None
+
+    def _remember(self, key, embedding: List[float]):
+        self._memory_cache[key] = embedding
+        self._memory_cache.move_to_end(key)
+        while len(self._memory_cache) > self.memory_cache_size:
+            self._memory_cache.popitem(last=False)
+
+    def _store(self, key, embedding: List[float]):
+        with self._lock:
+            self._remember(key, embedding)
+            if self._connection is None:
+                return
+            try:
+                with self._connection:
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO embeddings (model, text_hash, embedding, last_used) VALUES (?, ?, ?, ?)",
+                        (*key, np.asarray(embedding, dtype=np.float32).tobytes(), time.time())
+                    )
+                    count = self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                    if count > self.disk_cache_size:
+                        # Evict down to 90% so eviction does not run on every insert
+                        excess = count - int(self.disk_cache_size * 0.9)
+                        self._connection.execute(
+                            "DELETE FROM embeddings WHERE rowid IN "
+                            "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                            (excess,)
+                        )
+                        self.stats["evictions"] += excess
+            except Exception as e:
+                print(f"Embedding cache error: {str(e)}")
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
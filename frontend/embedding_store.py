@@ -0,0 +1,205 @@
+import os
+import json
+import struct
+import argparse
+import numpy as np
+from typing import List, Dict, Optional, Iterable, Set, Sequence
+from vector_index import VectorIndex
+
+class EmbeddingStore:
+    MAGIC = b"AIEMBED1"
+    # Version 2 rows are unit length, so they can be scored in place without normalizing
+    VERSION = 2
+    HEADER_FORMAT = "<8sHHI"
+    HEADER_SIZE = 64
+    DTYPE_CODES = {"float32": 0, "float16": 1}
+
+    def __init__(self, vectors_file: str, rows_file: str, dtype: str = "float32"):
+        self.vectors_file = vectors_file
+        self.rows_file = rows_file
+        self.dtype = np.dtype(dtype)
+        self.dimension = None
+        self.rows = []
+        self._mmap = None
+        self._load()
+
+    def _load(self):
+        stored_rows = 0
+        version = self.VERSION
+        if os.path.exists(self.vectors_file) and os.path.getsize(self.vectors_file) >= self.HEADER_SIZE:
+            with open(self.vectors_file, "rb") as f:
+                header = f.read(struct.calcsize(self.HEADER_FORMAT))
+            magic, version, dtype_code, dimension = struct.unpack(self.HEADER_FORMAT, header)
+            if magic != self.MAGIC or version not in (1, self.VERSION):
+                raise ValueError(f"Unsupported embedding store format in {self.vectors_file}")
+            codes = {code: name for name, code in self.DTYPE_CODES.items()}
+            if dtype_code not in codes:
+                raise ValueError(f"Unknown embedding dtype code {dtype_code} in {self.vectors_file}")
+            self.dtype = np.dtype(codes[dtype_code])
+            self.dimension = dimension
+            if dimension:
+                stored_rows = (os.path.getsize(self.vectors_file) - self.HEADER_SIZE) // self._row_bytes()
+
+        rows = []
+        damaged = False
+        if os.path.exists(self.rows_file):
+            with open(self.rows_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        rows.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        damaged = True
+                        break
+        # A crash between the two appends leaves one file longer than the other
+        self.rows = rows[:stored_rows]
+        if damaged or len(rows) > stored_rows:
+            with open(self.rows_file, "w", encoding="utf-8") as f:
+                for row in self.rows:
+                    f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        if version < self.VERSION and self.rows:
+            # Copied out of the mapping, which must be closed before the file is replaced on Windows
+            vectors = np.array(self.vectors(), dtype=np.float32)
+            self._close_mmap()
+            self.rewrite(
+                {**row, "embedding": vectors[position]}
+                for position, row in enumerate(self.rows)
+            )
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _row_bytes(self) -> int:
+        return self.dimension * self.dtype.itemsize
+
+    def _header(self) -> bytes:
+        header = struct.pack(self.HEADER_FORMAT, self.MAGIC, self.VERSION,
+                             self.DTYPE_CODES[self.dtype.name], self.dimension)
+        return header.ljust(self.HEADER_SIZE, b"\0")
+
+    def _close_mmap(self):
+        if self._mmap is not None:
+            del self._mmap
+            self._mmap = None
+
+    def append(self, start_timestamp: str, end_timestamp: str, embedding: Sequence[float]) -> int:
+        if not self.rows:
+            self.dimension = len(embedding)
+        if len(embedding) != self.dimension:
+            raise ValueError(f"Embedding dimension {len(embedding)} does not match store dimension {self.dimension}")
+
+        self._close_mmap()
+        data_end = self.HEADER_SIZE + len(self.rows) * self._row_bytes()
+        mode = "r+b" if self.rows else "wb"
+        with open(self.vectors_file, mode) as f:
+            if mode == "wb":
+                f.write(self._header())
+            f.seek(data_end)
+            f.truncate()
+            f.write(VectorIndex.normalize(embedding).astype(self.dtype).tobytes())
+
+        row = {"start_timestamp": start_timestamp, "end_timestamp": end_timestamp}
+        with open(self.rows_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self.rows.append(row)
+        return len(self.rows) - 1
+
+    def vectors(self) -> np.ndarray:
+        if not self.rows:
+            return np.zeros((0, self.dimension or 0), dtype=self.dtype)
+        if self._mmap is None or self._mmap.shape[0] != len(self.rows):
+            self._close_mmap()
+            self._mmap = np.memmap(self.vectors_file, dtype=self.dtype, mode="r",
+                                   offset=self.HEADER_SIZE, shape=(len(self.rows), self.dimension))
+        return self._mmap
+
+    def embedding(self, row: int) -> List[float]:
+        return self.vectors()[row].astype(np.float32).tolist()
+
+    def row_lookup(self) -> Dict[str, int]:
+        return {
+            f"{row.get('start_timestamp')}_{row.get('end_timestamp')}": position
+            for position, row in enumerate(self.rows)
+        }
+
+    def rewrite(self, entries: Iterable[Dict], dtype: Optional[str] = None) -> int:
+        target_dtype = np.dtype(dtype) if dtype else self.dtype
+        temp_vectors = f"{self.vectors_file}.tmp"
+        temp_rows = f"{self.rows_file}.tmp"
+        dimension = None
+        written = 0
+
+        try:
+            with open(temp_vectors, "wb") as vf, open(temp_rows, "w", encoding="utf-8") as rf:
+                vf.write(b"\0" * self.HEADER_SIZE)
+                for entry in entries:
+                    embedding = entry.get("embedding")
+                    if embedding is None or len(embedding) == 0:
+                        continue
+                    if dimension is None:
+                        dimension = len(embedding)
+                    if len(embedding) != dimension:
+                        continue
+                    vf.write(VectorIndex.normalize(embedding).astype(target_dtype).tobytes())
+                    rf.write(json.dumps({
+                        "start_timestamp": entry.get("start_timestamp", ""),
+                        "end_timestamp": entry.get("end_timestamp", "")
+                    }, ensure_ascii=False) + "\n")
+                    written += 1
+
+                self.dtype = target_dtype
+                self.dimension = dimension or self.dimension or 0
+                vf.seek(0)
+                vf.write(self._header())
+
+            self._close_mmap()
+            os.replace(temp_vectors, self.vectors_file)
+            os.replace(temp_rows, self.rows_file)
+        finally:
+            for temp_file in [temp_vectors, temp_rows]:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+
+        self._load()
+        return written
+
+    def compact(self, keep_keys: Optional[Set[str]] = None, dtype: Optional[str] = None) -> int:
+        latest = {}
+        vectors = self.vectors()
+        for position, row in enumerate(self.rows):
+            key = f"{row.get('start_timestamp')}_{row.get('end_timestamp')}"
+            if keep_keys is not None and key not in keep_keys:
+                continue
+            latest[key] = position
+
+        before = len(self.rows)
+        kept = sorted(latest.values())
+        entries = [
+            {**self.rows[position], "embedding": np.array(vectors[position], dtype=np.float32)}
+            for position in kept
+        ]
+        # rewrite replaces the mapped file, which Windows refuses while any view of it is alive
+        del vectors
+        self._close_mmap()
+        self.rewrite(entries, dtype=dtype)
+        return before - len(self.rows)
+
+def main():
+    from memory_handler import MemoryHandler
+
+    parser = argparse.ArgumentParser(description="Manage the binary conversation embedding store")
+    parser.add_argument("command", choices=["migrate", "compact"])
+    parser.add_argument("--dtype", choices=list(EmbeddingStore.DTYPE_CODES), default=None)
+    args = parser.parse_args()
+
+    # Creating the handler in binary mode already imports a leftover chat_embeddings.jsonl
+    memory_handler = MemoryHandler(storage_backend="binary", binary_dtype=args.dtype or "float32")
+    if args.command == "migrate":
+        print(f"{memory_handler.embedding_store.vectors_file} holds {len(memory_handler.embedding_store)} embeddings")
+    else:
+        removed = memory_handler.compact_embeddings(dtype=args.dtype)
+        print(f"Compaction removed {removed} rows, {len(memory_handler.embedding_store)} left")
+
+if __name__ == "__main__":
+    main()
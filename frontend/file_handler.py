@@ -1,15 +1,41 @@
 import os
 import json
-from typing import List, Dict
-from sklearn.metrics.pairwise import cosine_similarity
-import ollama
+import threading
+from typing import Callable, List, Dict, Optional, Set
+from embedding_service import EmbeddingService
+from llm_backend import ModelBackend
+from markdown_index import MarkdownIndex
+from folder_watcher import FolderWatcher
+from bulk_indexer import BulkIndexer
 
 class FileHandler:
-    def __init__(self):
+    def __init__(self, embedding_service: Optional[EmbeddingService] = None, watch_folder: bool = True,
+                 backend: Optional[ModelBackend] = None):
         self.data_folder = "data"
         os.makedirs(self.data_folder, exist_ok=True)
+        self.embedding_service = embedding_service or EmbeddingService(data_folder=self.data_folder, backend=backend)
         self.local_info_file = os.path.join(self.data_folder, "local_info.json")
         self.local_folder = self._load_local_folder()
+        self.similarity_threshold = 0.55
+        self.max_results = 5
+        self.max_context_tokens = 1500
+        self.markdown_index = MarkdownIndex(
+            os.path.join(self.data_folder, "markdown_index.db"), self.embedding_service
+        )
+        self.bulk_indexer = BulkIndexer(self.markdown_index)
+        self.progress_callback: Optional[Callable[[Dict], None]] = None
+        self.watch_folder = watch_folder
+        self.index_ready = threading.Event()
+        self.last_index_counts = {}
+        self._watcher = None
+        self._pending_lock = threading.Lock()
+        self._pending_paths = set()
+        self._pending_rescan = False
+        self._pending_event = threading.Event()
+        self._closed = False
+        self._indexer = None
+        if self.watch_folder and self.local_folder:
+            self.start_watching()
 
     def _load_local_folder(self) -> str:
         if os.path.exists(self.local_info_file):
@@ -22,6 +48,68 @@ class FileHandler:
         with open(self.local_info_file, "w", encoding="utf-8") as f:
             json.dump({"local_folder": folder_path}, f)
         self.local_folder = folder_path
+        if self.watch_folder:
+            self.start_watching()
+
+    def start_watching(self):
+        self.stop_watching()
+        self.bulk_indexer.cancel()
+        if not self.local_folder or not os.path.isdir(self.local_folder):
+            return
+        self.index_ready.clear()
+        with self._pending_lock:
+            self._pending_paths = set()
+            self._pending_rescan = True
+        self._watcher = FolderWatcher(self.local_folder, self._queue_changes)
+        self._watcher.start()
+        if self._indexer is None or not self._indexer.is_alive():
+            self._indexer = threading.Thread(target=self._index_worker, daemon=True)
+            self._indexer.start()
+        self._pending_event.set()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _queue_changes(self, paths: Optional[Set[str]]):
+        with self._pending_lock:
+            if paths is None:
+                self._pending_rescan = True
+            else:
+                self._pending_paths.update(paths)
+        self._pending_event.set()
+
+    def _index_worker(self):
+        while not self._closed:
+            self._pending_event.wait()
+            self._pending_event.clear()
+            if self._closed:
+                return
+            with self._pending_lock:
+                paths, self._pending_paths = self._pending_paths, set()
+                rescan, self._pending_rescan = self._pending_rescan, False
+            try:
+                if rescan:
+                    self.last_index_counts = self.bulk_indexer.run(self.scan_markdown_files(), self._report_progress)
+                    if not self.bulk_indexer.cancelled:
+                        self.index_ready.set()
+                elif paths:
+                    self.markdown_index.update_paths(sorted(paths))
+            except Exception as e:
+                print(f"Markdown indexing error: {str(e)}")
+
+    def _report_progress(self, progress: Dict):
+        # Looked up on every report: the startup rescan begins before the window sets the callback
+        callback = self.progress_callback
+        if callback is not None:
+            callback(progress)
+
+    def close(self):
+        self._closed = True
+        self.bulk_indexer.cancel()
+        self.stop_watching()
+        self._pending_event.set()
 
     def scan_markdown_files(self) -> List[str]:
         if not self.local_folder:
@@ -34,34 +122,23 @@ class FileHandler:
         return markdown_files
 
     def get_embedding(self, text: str) -> List[float]:
-        try:
-            response = ollama.embeddings(model='nomic-embed-text', prompt=text)
-            return response['embedding']
-        except Exception as e:
-            print(f"Embedding error: {str(e)}")
-            return []
+        return self.embedding_service.get_embedding(text)
 
-    def find_relevant_markdown_content(self, user_input: str) -> List[Dict]:
+    def find_relevant_markdown_content(self, user_input: str,
+                                       query_embedding: Optional[List[float]] = None) -> List[Dict]:
         relevant_content = []
-        user_embedding = self.get_embedding(user_input)
+        # An empty query_embedding is a failed attempt by the caller, not a missing one
+        user_embedding = query_embedding if query_embedding is not None else self.get_embedding(user_input)
         if not user_embedding:
             return relevant_content
 
-        markdown_files = self.scan_markdown_files()
-        for file_path in markdown_files:
-            with open(file_path, "r", encoding="utf-8") as f:
-                content = f.read()
-                embedding = self.get_embedding(content)
-                if not embedding:
-                    continue
-                try:
-                    similarity = cosine_similarity([user_embedding], [embedding])[0][0]
-                except ValueError:
-                    continue
-                if similarity > 0.55:
-                    relevant_content.append({
-                        "file_path": file_path,
-                        "content": content,
-                        "similarity": similarity
-                    })
-        return sorted(relevant_content, key=lambda x: x["similarity"], reverse=True)[:3]
\ No newline at end of file
+        # With a watcher running the index is kept fresh in the background, so only search it here
+        if self._watcher is None:
+            self.markdown_index.refresh(self.scan_markdown_files())
+        used_tokens = 0
+        for chunk in self.markdown_index.search(user_embedding, self.max_results, self.similarity_threshold):
+            if used_tokens + chunk["tokens"] > self.max_context_tokens:
+                continue
+            used_tokens += chunk["tokens"]
+            relevant_content.append(chunk)
+        return relevant_content
\ No newline at end of file
@@ -0,0 +1,194 @@
+import os
+import sys
+import time
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+import threading
+from typing import Callable, Dict, Optional, Set, Tuple
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+class FolderWatcher:
+    def __init__(self, folder: str, on_change: Callable[[Optional[Set[str]]], None],
+                 extensions: Tuple[str, ...] = (".md",), poll_interval: float = 5.0,
+                 debounce: float = 1.0, use_inotify: bool = True):
+        self.folder = folder
+        self.on_change = on_change
+        self.extensions = extensions
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.use_inotify = use_inotify
+        self.backend = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._inotify_fd = None
+        self._watches = {}
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        if self.use_inotify and self._start_inotify():
+            self.backend = "inotify"
+            target = self._inotify_loop
+        else:
+            self.backend = "polling"
+            target = self._polling_loop
+        self._thread = threading.Thread(target=target, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=max(self.poll_interval, 1.0) + 1.0)
+        self._thread = None
+        if self._inotify_fd is not None:
+            os.close(self._inotify_fd)
+            self._inotify_fd = None
+        self._watches = {}
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _matches(self, path: str) -> bool:
+        return path.endswith(self.extensions)
+
+    def _emit(self, paths: Optional[Set[str]]):
+        try:
+            self.on_change(paths)
+        except Exception as e:
+            print(f"Folder watcher callback error: {str(e)}")
+
+    def _snapshot(self) -> Dict[str, Tuple[float, int]]:
+        snapshot = {}
+        for root, _, files in os.walk(self.folder):
+            for file in files:
+                path = os.path.join(root, file)
+                if not self._matches(path):
+                    continue
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_mtime, stat.st_size)
+        return snapshot
+
+    def _polling_loop(self):
+        previous = self._snapshot()
+        while not self._stop_event.wait(self.poll_interval):
+            current = self._snapshot()
+            changed = {path for path, state in current.items() if previous.get(path) != state}
+            changed.update(path for path in previous if path not in current)
+            previous = current
+            if changed:
+                self._emit(changed)
+
+    def _start_inotify(self) -> bool:
+        if not sys.platform.startswith("linux"):
+            return False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                return False
+            self._libc = libc
+            self._inotify_fd = fd
+            for root, _, _ in os.walk(self.folder):
+                if not self._add_watch(root):
+                    os.close(fd)
+                    self._inotify_fd = None
+                    return False
+            return True
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable, falling back to polling: {str(e)}")
+            return False
+
+    def _add_watch(self, directory: str) -> bool:
+        wd = self._libc.inotify_add_watch(self._inotify_fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                print("inotify watch limit reached, falling back to polling")
+                return False
+            return error == errno.ENOENT
+        self._watches[wd] = directory
+        return True
+
+    def _inotify_loop(self):
+        pending = set()
+        rescan = False
+        deadline = None
+        while not self._stop_event.is_set():
+            timeout = 0.5 if deadline is None else max(0.0, min(0.5, deadline - time.monotonic()))
+            try:
+                readable, _, _ = select.select([self._inotify_fd], [], [], timeout)
+            except (OSError, ValueError, TypeError):
+                return
+            if readable:
+                try:
+                    data = os.read(self._inotify_fd, 65536)
+                except BlockingIOError:
+                    data = b""
+                except OSError:
+                    return
+                changed, overflow = self._parse_events(data)
+                pending.update(changed)
+                rescan = rescan or overflow
+                if (changed or overflow) and deadline is None:
+                    deadline = time.monotonic() + self.debounce
+
+            if deadline is not None and time.monotonic() >= deadline:
+                self._emit(None if rescan else pending)
+                pending = set()
+                rescan = False
+                deadline = None
+
+    def _parse_events(self, data: bytes) -> Tuple[Set[str], bool]:
+        changed = set()
+        overflow = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + name_length].rstrip(b"\0")
+            offset += EVENT_HEADER.size + name_length
+
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files can land in a new directory before its watch exists, so report what is already there
+                    for root, _, files in os.walk(path):
+                        self._add_watch(root)
+                        changed.update(os.path.join(root, file) for file in files if self._matches(file))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    changed.add(path)
+                continue
+            if self._matches(path):
+                changed.add(path)
+        return changed, overflow
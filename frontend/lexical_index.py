@@ -0,0 +1,80 @@
+import re
+import math
+import heapq
+from collections import Counter
+from typing import List, Tuple
+
+class BM25Index:
+    TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+    # Light suffix stripping so inflected Russian names and words still match
+    ENDINGS = sorted([
+        "иями", "ями", "ами", "ого", "его", "ому", "ему", "ыми", "ими", "ой", "ей", "ий", "ый", "ая", "яя",
+        "ое", "ее", "ам", "ям", "ах", "ях", "ов", "ев", "ом", "ем", "ую", "юю", "ы", "и", "а", "я", "о",
+        "е", "у", "ю", "ь", "'s", "es", "s"
+    ], key=len, reverse=True)
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, min_stem_length: int = 3):
+        self.k1 = k1
+        self.b = b
+        self.min_stem_length = min_stem_length
+        self.postings = {}
+        self.doc_lengths = []
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def tokenize(self, text: str) -> List[str]:
+        tokens = []
+        for token in self.TOKEN_PATTERN.findall(text.lower()):
+            if len(token) < 2 or token.isdigit() and len(token) < 4:
+                continue
+            tokens.append(self.stem(token))
+        return tokens
+
+    def stem(self, token: str) -> str:
+        for ending in self.ENDINGS:
+            if token.endswith(ending) and len(token) - len(ending) >= self.min_stem_length:
+                return token[:-len(ending)]
+        return token
+
+    def add(self, text: str) -> int:
+        doc_id = len(self.doc_lengths)
+        tokens = self.tokenize(text)
+        for term, frequency in Counter(tokens).items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        self.doc_lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        return doc_id
+
+    def replace(self, doc_id: int, text: str, previous_text: str):
+        for term in set(self.tokenize(previous_text)):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        tokens = self.tokenize(text)
+        for term, frequency in Counter(tokens).items():
+            self.postings.setdefault(term, {})[doc_id] = frequency
+        self.total_length += len(tokens) - self.doc_lengths[doc_id]
+        self.doc_lengths[doc_id] = len(tokens)
+
+    def search(self, query: str, top_k: int, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        if not self.doc_lengths or top_k <= 0:
+            return []
+
+        doc_count = len(self.doc_lengths)
+        average_length = self.total_length / doc_count or 1.0
+        scores = {}
+        for term in set(self.tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / average_length
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(doc_id, score) for doc_id, score in best if score > min_score]
@@ -0,0 +1,155 @@
+import re
+import time
+import hashlib
+import threading
+import ollama
+from abc import ABC, abstractmethod
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+from markdown_chunker import estimate_tokens
+
+class ModelBackend(ABC):
+    # Everything the assistant asks of a model server. Responses are dicts shaped like Ollama's,
+    # and chat(stream=True) returns an iterator of chunks whose last one has done=True.
+    @abstractmethod
+    def chat(self, model: str, messages: List[Dict], options: Optional[Dict] = None,
+             keep_alive: Optional[str] = None, stream: bool = False):
+        pass
+
+    @abstractmethod
+    def generate(self, model: str, prompt: str, options: Optional[Dict] = None,
+                 keep_alive: Optional[str] = None) -> Dict:
+        pass
+
+    @abstractmethod
+    def embed(self, model: str, input: List[str], keep_alive: Optional[str] = None) -> Dict:
+        pass
+
+    @abstractmethod
+    def embeddings(self, model: str, prompt: str, keep_alive: Optional[str] = None) -> Dict:
+        pass
+
+class OllamaBackend(ModelBackend):
+    def __init__(self, host: Optional[str] = None):
+        # Without a host the module-level client is used, which honours OLLAMA_HOST
+        self.client = ollama.Client(host=host) if host else ollama
+
+    def chat(self, model, messages, options=None, keep_alive=None, stream=False):
+        return self.client.chat(model=model, messages=messages, options=options,
+                                keep_alive=keep_alive, stream=stream)
+
+    def generate(self, model, prompt, options=None, keep_alive=None):
+        return self.client.generate(model=model, prompt=prompt, options=options, keep_alive=keep_alive)
+
+    def embed(self, model, input, keep_alive=None):
+        return self.client.embed(model=model, input=input, keep_alive=keep_alive)
+
+    def embeddings(self, model, prompt, keep_alive=None):
+        return self.client.embeddings(model=model, prompt=prompt, keep_alive=keep_alive)
+
+def fake_embedding(text: str, dimension: int = 768) -> List[float]:
+    # Hashed bag of words: deterministic, and texts sharing words get similar vectors
+    vector = np.zeros(dimension, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        vector[int.from_bytes(digest[:4], "little") % dimension] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        norm = 1.0
+    return (vector / norm).tolist()
+
+CANNED_REPLIES = [
+    "Хороший вопрос. Судя по тому, что мы обсуждали, стоит начать с главного.",
+    "Вот что я нашёл в заметках и в истории наших разговоров.",
+    "Коротко: это зависит от задачи, но обычно достаточно простого решения.",
+    "Давай разберём по шагам, чтобы ничего не упустить."
+]
+
+class FakeBackend(ModelBackend):
+    # Deterministic stand-in for benchmarks: no model and no network, only the configured delays.
+    # latency is paid once per request, prompt_token_latency per prompt token that misses the
+    # prefix cache and token_latency per generated token.
+    def __init__(self, dimension: int = 768, latency: float = 0.0, prompt_token_latency: float = 0.0,
+                 token_latency: float = 0.0, embed_latency: float = 0.0, reply_tokens: int = 48,
+                 replies: Optional[List[str]] = None):
+        self.dimension = dimension
+        self.latency = latency
+        self.prompt_token_latency = prompt_token_latency
+        self.token_latency = token_latency
+        self.embed_latency = embed_latency
+        self.reply_tokens = reply_tokens
+        self.replies = replies or CANNED_REPLIES
+        self.stats = {"chats": 0, "generations": 0, "embed_requests": 0, "embedded_texts": 0,
+                      "prompt_tokens": 0, "evaluated_tokens": 0}
+        self._cached_prefix = {}
+        self._lock = threading.Lock()
+
+    def _reply_for(self, text: str) -> List[str]:
+        # A canned opening picked by the text's hash, then the text's own words, cycled to a fixed length
+        digest = int(hashlib.md5(text.encode("utf-8")).hexdigest(), 16)
+        words = (self.replies[digest % len(self.replies)] + " " + text).split()
+        return [words[index % len(words)] for index in range(self.reply_tokens)]
+
+    def _prefill(self, model: str, messages: List[Dict]) -> Tuple[int, int]:
+        # Mimics Ollama's prompt cache: only messages after the prefix shared with the previous
+        # request are evaluated again
+        prompt = [(message.get("role"), message.get("content", "")) for message in messages]
+        with self._lock:
+            previous = self._cached_prefix.get(model, [])
+            shared = 0
+            while shared < min(len(prompt), len(previous)) and prompt[shared] == previous[shared]:
+                shared += 1
+            self._cached_prefix[model] = prompt
+        total = sum(estimate_tokens(content) + 8 for _, content in prompt)
+        evaluated = sum(estimate_tokens(content) + 8 for _, content in prompt[shared:])
+        return total, evaluated
+
+    def _record(self, key: str, prompt_tokens: int = 0, evaluated: int = 0):
+        with self._lock:
+            self.stats[key] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["evaluated_tokens"] += evaluated
+
+    def chat(self, model, messages, options=None, keep_alive=None, stream=False):
+        if not messages:
+            # Warm-up request: the model is "loaded" straight away
+            response = {"model": model, "message": {"role": "assistant", "content": ""}, "done": True}
+            return iter([response]) if stream else response
+
+        total, evaluated = self._prefill(model, messages)
+        self._record("chats", total, evaluated)
+        prefill_seconds = self.latency + evaluated * self.prompt_token_latency
+        words = self._reply_for(messages[-1].get("content", ""))
+        final = {"model": model, "done": True, "prompt_eval_count": evaluated,
+                 "prompt_eval_duration": int(prefill_seconds * 1e9), "eval_count": len(words)}
+        if stream:
+            return self._stream(words, prefill_seconds, final)
+
+        time.sleep(prefill_seconds + len(words) * self.token_latency)
+        return {**final, "message": {"role": "assistant", "content": " ".join(words)}}
+
+    def _stream(self, words: List[str], prefill_seconds: float, final: Dict):
+        time.sleep(prefill_seconds)
+        for index, word in enumerate(words):
+            time.sleep(self.token_latency)
+            yield {"message": {"role": "assistant", "content": word if index == 0 else " " + word}, "done": False}
+        yield {**final, "message": {"role": "assistant", "content": ""}}
+
+    def generate(self, model, prompt, options=None, keep_alive=None):
+        tokens = estimate_tokens(prompt)
+        self._record("generations", tokens, tokens)
+        words = self._reply_for(prompt.split("Conversation:")[-1].replace("Summary:", ""))
+        time.sleep(self.latency + tokens * self.prompt_token_latency + len(words) * self.token_latency)
+        return {"model": model, "response": " ".join(words), "done": True}
+
+    def embed(self, model, input, keep_alive=None):
+        texts = [input] if isinstance(input, str) else list(input)
+        with self._lock:
+            self.stats["embed_requests"] += 1
+            self.stats["embedded_texts"] += len(texts)
+        time.sleep(self.embed_latency if texts else 0.0)
+        return {"model": model, "embeddings": [fake_embedding(text, self.dimension) for text in texts]}
+
+    def embeddings(self, model, prompt, keep_alive=None):
+        return {"embedding": self.embed(model, [prompt])["embeddings"][0]}
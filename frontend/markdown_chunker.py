@@ -0,0 +1,120 @@
+import re
+from typing import List, Dict
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+FENCE_PATTERN = re.compile(r"^\s*(```|~~~)")
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+def estimate_tokens(text: str) -> int:
+    # Rough llama-style estimate: Cyrillic and other non-ASCII words split into more pieces than English ones
+    tokens = 0
+    for piece in TOKEN_PATTERN.findall(text):
+        if piece.isascii():
+            tokens += 1 + len(piece) // 8
+        else:
+            tokens += 1 + len(piece) // 4
+    return tokens
+
+def _split_blocks(lines: List[str], first_line: int) -> List[Dict]:
+    blocks = []
+    current = []
+    start = first_line
+    in_fence = False
+    for offset, line in enumerate(lines):
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        if not line.strip() and not in_fence:
+            if current:
+                blocks.append({"lines": current, "start_line": start, "end_line": first_line + offset - 1})
+                current = []
+            continue
+        if not current:
+            start = first_line + offset
+        current.append(line)
+    if current:
+        blocks.append({"lines": current, "start_line": start, "end_line": start + len(current) - 1})
+    return blocks
+
+def _split_oversized(block: Dict, max_tokens: int) -> List[Dict]:
+    pieces = []
+    current = []
+    current_tokens = 0
+    start = block["start_line"]
+    for offset, line in enumerate(block["lines"]):
+        line_tokens = estimate_tokens(line)
+        if current and current_tokens + line_tokens > max_tokens:
+            pieces.append({"lines": current, "start_line": start, "end_line": start + len(current) - 1})
+            current = []
+            current_tokens = 0
+            start = block["start_line"] + offset
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        pieces.append({"lines": current, "start_line": start, "end_line": start + len(current) - 1})
+    return pieces
+
+def _sections(text: str) -> List[Dict]:
+    sections = []
+    heading_path = []
+    current = {"heading": "", "lines": [], "start_line": 1}
+    in_fence = False
+    for number, line in enumerate(text.splitlines(), start=1):
+        if FENCE_PATTERN.match(line):
+            in_fence = not in_fence
+        match = None if in_fence else HEADING_PATTERN.match(line)
+        if match:
+            if current["lines"]:
+                sections.append(current)
+            level = len(match.group(1))
+            heading_path = heading_path[:level - 1] + [match.group(2)]
+            current = {"heading": " > ".join(heading_path), "lines": [], "start_line": number + 1}
+            continue
+        current["lines"].append(line)
+    if current["lines"]:
+        sections.append(current)
+    return sections
+
+def chunk_markdown(text: str, max_tokens: int = 400, overlap_tokens: int = 60) -> List[Dict]:
+    chunks = []
+    for section in _sections(text):
+        blocks = []
+        for block in _split_blocks(section["lines"], section["start_line"]):
+            block_text = "\n".join(block["lines"])
+            block["tokens"] = estimate_tokens(block_text)
+            if block["tokens"] > max_tokens:
+                for piece in _split_oversized(block, max_tokens):
+                    piece["tokens"] = estimate_tokens("\n".join(piece["lines"]))
+                    blocks.append(piece)
+            else:
+                blocks.append(block)
+
+        current = []
+        current_tokens = 0
+        for block in blocks:
+            if current and current_tokens + block["tokens"] > max_tokens:
+                chunks.append(_make_chunk(section["heading"], current))
+                # Carry trailing blocks into the next chunk so context survives the cut
+                overlap = []
+                overlap_size = 0
+                for previous in reversed(current):
+                    if overlap_size + previous["tokens"] > overlap_tokens:
+                        break
+                    overlap.insert(0, previous)
+                    overlap_size += previous["tokens"]
+                current = overlap
+                current_tokens = overlap_size
+            current.append(block)
+            current_tokens += block["tokens"]
+        if current:
+            chunks.append(_make_chunk(section["heading"], current))
+    return chunks
+
+def _make_chunk(heading: str, blocks: List[Dict]) -> Dict:
+    body = "\n\n".join("\n".join(block["lines"]) for block in blocks)
+    return {
+        "heading": heading,
+        "text": body,
+        "start_line": blocks[0]["start_line"],
+        "end_line": blocks[-1]["end_line"],
+        "tokens": estimate_tokens(body)
+    }
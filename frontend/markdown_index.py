@@ -0,0 +1,254 @@
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from typing import List, Dict, Optional, Tuple
+from vector_index import VectorIndex
+from embedding_service import EmbeddingService
+from markdown_chunker import chunk_markdown
+
+class MarkdownIndex:
+    def __init__(self, database_file: str, embedding_service: EmbeddingService,
+                 chunk_tokens: int = 400, overlap_tokens: int = 60):
+        self.database_file = database_file
+        self.embedding_service = embedding_service
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(database_file, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._connection:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS indexed_files (
+                    path TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL
+                )
+            """)
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    path TEXT NOT NULL,
+                    heading TEXT NOT NULL,
+                    start_line INTEGER NOT NULL,
+                    end_line INTEGER NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    embedding BLOB NOT NULL
+                )
+            """)
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_chunks_path ON chunks (path)")
+        self._files = {}
+        self._chunks = {}
+        self._file_chunks = {}
+        self._vector_index = None
+        self._indexed_chunks = []
+        self._load()
+
+    def _load(self):
+        for path, mtime, size, content_hash in self._connection.execute(
+            "SELECT path, mtime, size, content_hash FROM indexed_files"
+        ).fetchall():
+            self._files[path] = {"mtime": mtime, "size": size, "content_hash": content_hash}
+        for chunk_id, path, embedding in self._connection.execute(
+            "SELECT id, path, embedding FROM chunks"
+        ).fetchall():
+            self._chunks[chunk_id] = {"path": path, "embedding": np.frombuffer(embedding, dtype=np.float32)}
+            self._file_chunks.setdefault(path, []).append(chunk_id)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    @staticmethod
+    def _read(file_path: str) -> Optional[str]:
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                return f.read()
+        except Exception as e:
+            print(f"Error reading {file_path}: {str(e)}")
+            return None
+
+    def _delete_file(self, path: str):
+        self._connection.execute("DELETE FROM chunks WHERE path = ?", (path,))
+        self._connection.execute("DELETE FROM indexed_files WHERE path = ?", (path,))
+        self._files.pop(path, None)
+        for chunk_id in self._file_chunks.pop(path, []):
+            del self._chunks[chunk_id]
+
+    def refresh(self, file_paths: List[str]) -> Dict[str, int]:
+        return self._sync(file_paths, prune=True)
+
+    def update_paths(self, paths: List[str]) -> Dict[str, int]:
+        return self._sync(paths, prune=False)
+
+    def _sync(self, file_paths: List[str], prune: bool) -> Dict[str, int]:
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        candidates, missing, counts["unchanged"] = self.find_changes(file_paths)
+        changed = []
+        for candidate in candidates:
+            prepared = self.prepare_file(*candidate)
+            if prepared is None:
+                counts["unchanged"] += 1
+            elif prepared:
+                changed.append(prepared)
+
+        # Embedding runs without the lock so searches keep answering from the current index
+        if changed:
+            for prepared, indexed in zip(changed, self.index_files(changed)):
+                if indexed:
+                    counts["updated" if prepared["existed"] else "added"] += 1
+
+        counts["removed"] = self.remove_missing(file_paths if prune else None, missing)
+        return counts
+
+    def find_changes(self, file_paths: List[str]) -> Tuple[List[tuple], List[str], int]:
+        candidates = []
+        missing = []
+        unchanged = 0
+        with self._lock:
+            for file_path in file_paths:
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    missing.append(file_path)
+                    continue
+                if not os.path.isfile(file_path):
+                    continue
+                known = self._files.get(file_path)
+                if known and known["mtime"] == stat.st_mtime and known["size"] == stat.st_size:
+                    unchanged += 1
+                    continue
+                candidates.append((file_path, stat))
+        return candidates, missing, unchanged
+
+    def prepare_file(self, file_path: str, stat: os.stat_result) -> Optional[Dict]:
+        # Returns None for a touched but identical file and {} for an unreadable one
+        content = self._read(file_path)
+        if content is None:
+            return {}
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        with self._lock:
+            known = self._files.get(file_path)
+            if known and known["content_hash"] == content_hash:
+                self._files[file_path] = {"mtime": stat.st_mtime, "size": stat.st_size, "content_hash": content_hash}
+                with self._connection:
+                    self._connection.execute(
+                        "UPDATE indexed_files SET mtime = ?, size = ? WHERE path = ?",
+                        (stat.st_mtime, stat.st_size, file_path)
+                    )
+                return None
+        return {
+            "path": file_path,
+            "stat": stat,
+            "content_hash": content_hash,
+            "existed": known is not None,
+            "chunks": self._chunk_file(file_path, content)
+        }
+
+    def remove_missing(self, current_paths: Optional[List[str]], missing: List[str]) -> int:
+        with self._lock:
+            if current_paths is not None:
+                current = set(current_paths)
+                removed = [path for path in self._files if path not in current]
+            else:
+                prefixes = tuple(path.rstrip(os.sep) + os.sep for path in missing)
+                missing = set(missing)
+                removed = [path for path in self._files if path in missing or path.startswith(prefixes)]
+            if removed:
+                with self._connection:
+                    for path in removed:
+                        self._delete_file(path)
+                self._vector_index = None
+        return len(removed)
+
+    def _chunk_file(self, file_path: str, content: str) -> List[Dict]:
+        chunks = chunk_markdown(content, self.chunk_tokens, self.overlap_tokens)
+        for chunk in chunks:
+            label = os.path.basename(file_path)
+            if chunk["heading"]:
+                label = f"{label}: {chunk['heading']}"
+            chunk["embedding_text"] = f"{label}\n{chunk['text']}"
+        return chunks
+
+    def index_files(self, prepared_files: List[Dict]) -> List[bool]:
+        embeddings = self.embedding_service.get_embeddings(
+            [chunk["embedding_text"] for prepared in prepared_files for chunk in prepared["chunks"]]
+        )
+
+        results = []
+        offset = 0
+        for prepared in prepared_files:
+            chunks = prepared["chunks"]
+            file_embeddings = embeddings[offset:offset + len(chunks)]
+            offset += len(chunks)
+            if any(not embedding for embedding in file_embeddings):
+                results.append(False)
+                continue
+            self._store_file(prepared["path"], prepared["stat"], prepared["content_hash"], chunks, file_embeddings)
+            results.append(True)
+        return results
+
+    def _store_file(self, file_path: str, stat: os.stat_result, content_hash: str,
+                    chunks: List[Dict], embeddings: List[List[float]]):
+        with self._lock, self._connection:
+            self._delete_file(file_path)
+            for chunk, embedding in zip(chunks, embeddings):
+                vector = np.asarray(embedding, dtype=np.float32)
+                cursor = self._connection.execute(
+                    "INSERT INTO chunks (path, heading, start_line, end_line, tokens, text, embedding) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (file_path, chunk["heading"], chunk["start_line"], chunk["end_line"],
+                     chunk["tokens"], chunk["text"], vector.tobytes())
+                )
+                self._chunks[cursor.lastrowid] = {"path": file_path, "embedding": vector}
+                self._file_chunks.setdefault(file_path, []).append(cursor.lastrowid)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO indexed_files (path, mtime, size, content_hash) VALUES (?, ?, ?, ?)",
+                (file_path, stat.st_mtime, stat.st_size, content_hash)
+            )
+            self._files[file_path] = {"mtime": stat.st_mtime, "size": stat.st_size, "content_hash": content_hash}
+            self._vector_index = None
+
+    def _build_vector_index(self) -> VectorIndex:
+        if self._vector_index is None:
+            self._vector_index = VectorIndex()
+            self._indexed_chunks = []
+            for chunk_id, chunk in self._chunks.items():
+                if self._vector_index.accepts(chunk["embedding"]):
+                    self._vector_index.add(chunk["embedding"])
+                    self._indexed_chunks.append(chunk_id)
+        return self._vector_index
+
+    def search(self, query_embedding: List[float], top_k: int, threshold: Optional[float] = None) -> List[Dict]:
+        with self._lock:
+            index = self._build_vector_index()
+            hits = [
+                (self._indexed_chunks[row], similarity)
+                for row, similarity in index.search(query_embedding, top_k, threshold)
+            ]
+            if not hits:
+                return []
+            placeholders = ",".join("?" * len(hits))
+            rows = self._connection.execute(
+                f"SELECT id, path, heading, start_line, end_line, tokens, text FROM chunks WHERE id IN ({placeholders})",
+                [chunk_id for chunk_id, _ in hits]
+            ).fetchall()
+
+        chunks = {
+            row[0]: {
+                "file_path": row[1],
+                "heading": row[2],
+                "start_line": row[3],
+                "end_line": row[4],
+                "tokens": row[5],
+                "content": row[6]
+            }
+            for row in rows
+        }
+        return [{**chunks[chunk_id], "similarity": similarity} for chunk_id, similarity in hits if chunk_id in chunks]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
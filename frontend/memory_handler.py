@@ -1,27 +1,98 @@
 import os
 import json
+import queue
+import threading
+import uuid
 from datetime import datetime
-import ollama
 from typing import List, Dict, Any, Optional
-from sklearn.metrics.pairwise import cosine_similarity
+from vector_index import VectorIndex, MappedVectorIndex
+from embedding_store import EmbeddingStore
+from sqlite_store import SQLiteMemoryStore
+from ann_index import IVFIndex
+from quantized_index import QuantizedIndex
+from lexical_index import BM25Index
+from embedding_service import EmbeddingService
+from llm_backend import ModelBackend
 
 class MemoryHandler:
-    def __init__(self):
+    def __init__(self, storage_backend: str = "jsonl", binary_dtype: str = "float32",
+                 retrieval_backend: str = "exact", quantization: Optional[str] = None,
+                 embedding_service: Optional[EmbeddingService] = None, backend: Optional[ModelBackend] = None,
+                 keep_alive: Optional[str] = None, num_ctx: Optional[int] = None):
         self.data_folder = "data"
         os.makedirs(self.data_folder, exist_ok=True)
+        self.embedding_service = embedding_service or EmbeddingService(data_folder=self.data_folder, backend=backend)
+        self.backend = backend or self.embedding_service.backend
+        # Same runner settings as the chat requests, so a summary does not reload llama3
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
         self.summary_log_file = os.path.join(self.data_folder, "chat_summary.jsonl")
         self.embeddings_file = os.path.join(self.data_folder, "chat_embeddings.jsonl")
+        self.ann_index_file = os.path.join(self.data_folder, "chat_ivf_index.npz")
+        self.summary_jobs_file = os.path.join(self.data_folder, "pending_summaries.json")
+        self.database_file = os.path.join(self.data_folder, "chat_memory.db")
+        self.storage_backend = storage_backend
+        self.retrieval_backend = retrieval_backend
+        self.quantization = quantization
+        self.rerank_size = 256
+        self.embedding_store = None
+        self.sqlite_store = None
+        if self.storage_backend == "binary":
+            self.embedding_store = EmbeddingStore(
+                os.path.join(self.data_folder, "chat_embeddings.bin"),
+                os.path.join(self.data_folder, "chat_embeddings_rows.jsonl"),
+                dtype=binary_dtype
+            )
+        elif self.storage_backend == "sqlite":
+            self.sqlite_store = SQLiteMemoryStore(self.database_file)
         self.summary_interval = 4
         self.summary_max_length = 500
+        self.similarity_threshold = 0.7
+        self.hybrid_retrieval = True
+        self.lexical_min_score = 0.5
+        self.fusion_candidates = 5
+        self.fusion_rank_constant = 60
+        self.summary_queue_size = 8
         self.pending_messages = []
+        self._index = None
+        self._indexed_summaries = []
+        self._store_rows = []
+        self._index_rows = {}
+        self._lexical_index = None
+        self._lexical_summaries = []
+        self._lexical_rows = {}
+        self._lock = threading.RLock()
+        self._summary_queue = queue.Queue(maxsize=self.summary_queue_size)
+        self._summary_jobs = {}
+        self._failed_jobs = []
+        self._worker = None
+        self._resumer = None
+        self._trainer = None
         self._ensure_log_files()
+        self._migrate_pending_jsonl()
+        self._resume_summary_jobs()
     
     def _ensure_log_files(self):
-        for file_path in [self.summary_log_file, self.embeddings_file]:
+        if self.sqlite_store is not None:
+            return
+        file_paths = [self.summary_log_file]
+        if self.embedding_store is None:
+            file_paths.append(self.embeddings_file)
+        for file_path in file_paths:
             if not os.path.exists(file_path):
                 with open(file_path, "w", encoding="utf-8") as f:
                     pass
     
+    def _migrate_pending_jsonl(self):
+        if self.sqlite_store is not None:
+            if os.path.exists(self.summary_log_file) and os.path.getsize(self.summary_log_file) > 0:
+                self.import_jsonl_to_sqlite()
+            return
+        if self.embedding_store is None:
+            return
+        if os.path.exists(self.embeddings_file) and os.path.getsize(self.embeddings_file) > 0:
+            self.migrate_embeddings_to_binary()
+    
     def add_message(self, user_message: str, ai_reply: str):
         self.pending_messages.append({
             "timestamp": datetime.now().isoformat(),
@@ -30,24 +101,113 @@ class MemoryHandler:
         })
         
         if len(self.pending_messages) >= self.summary_interval:
-            self.create_and_save_summary()
+            self._submit_pending_messages()
     
     def force_summary(self) -> bool:
-        if self.pending_messages:
-            return self.create_and_save_summary()
-        return True
+        self._submit_pending_messages()
+        return self.flush_summaries()
+    
+    def flush_summaries(self) -> bool:
+        if self._resumer is not None:
+            self._resumer.join()
+        retry_jobs, self._failed_jobs = self._failed_jobs, []
+        for job in retry_jobs:
+            self._enqueue_job(job)
+        self._summary_queue.join()
+        return not self._failed_jobs
+    
+    def _submit_pending_messages(self):
+        if not self.pending_messages:
+            return
+        job = {"id": uuid.uuid4().hex, "messages": self.pending_messages}
+        self.pending_messages = []
+        with self._lock:
+            self._summary_jobs[job["id"]] = job
+            self._save_summary_jobs()
+        self._enqueue_job(job)
+    
+    def _enqueue_job(self, job: Dict):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._summary_worker, daemon=True)
+                self._worker.start()
+        self._summary_queue.put(job)
+    
+    def _summary_worker(self):
+        while True:
+            job = self._summary_queue.get()
+            try:
+                if job is None:
+                    return
+                if self._summarize_messages(job["messages"]):
+                    with self._lock:
+                        self._summary_jobs.pop(job["id"], None)
+                        self._save_summary_jobs()
+                else:
+                    self._failed_jobs.append(job)
+            finally:
+                self._summary_queue.task_done()
+    
+    def _stop_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            self._summary_queue.put(None)
+            self._worker.join()
+        self._worker = None
+    
+    def _save_summary_jobs(self):
+        # Jobs stay on disk until their summary is written, so an exit mid-job replays them
+        try:
+            temp_file = f"{self.summary_jobs_file}.tmp"
+            with open(temp_file, "w", encoding="utf-8") as file:
+                json.dump(list(self._summary_jobs.values()), file, ensure_ascii=False)
+            os.replace(temp_file, self.summary_jobs_file)
+        except Exception as e:
+            print(f"Error saving summary jobs: {str(e)}")
+    
+    def _resume_summary_jobs(self):
+        if not os.path.exists(self.summary_jobs_file):
+            return
+        try:
+            with open(self.summary_jobs_file, "r", encoding="utf-8") as file:
+                jobs = json.load(file)
+        except Exception as e:
+            print(f"Error loading summary jobs: {str(e)}")
+            return
+        # A crash after the summary was written but before the job was cleared replays the job;
+        # its summary is already stored, so it is only dropped from the list
+        stored = set(self._load_summaries())
+        resumed = []
+        for job in jobs:
+            messages = job["messages"]
+            if f"{messages[0]['timestamp']}_{messages[-1]['timestamp']}" in stored:
+                continue
+            self._summary_jobs[job["id"]] = job
+            resumed.append(job)
+        if len(resumed) != len(jobs):
+            self._save_summary_jobs()
+        if resumed:
+            # The queue is bounded, so the jobs are fed from a thread instead of blocking startup
+            self._resumer = threading.Thread(
+                target=lambda: [self._enqueue_job(job) for job in resumed], daemon=True
+            )
+            self._resumer.start()
     
     def create_and_save_summary(self) -> bool:
         if not self.pending_messages:
             return False
-            
+        if self._summarize_messages(self.pending_messages):
+            self.pending_messages = []
+            return True
+        return False
+    
+    def _summarize_messages(self, messages: List[Dict]) -> bool:
         try:
-            first_timestamp = self.pending_messages[0]["timestamp"]
-            last_timestamp = self.pending_messages[-1]["timestamp"]
+            first_timestamp = messages[0]["timestamp"]
+            last_timestamp = messages[-1]["timestamp"]
             
             conversation_text = "\n".join(
                 f"User: {msg['user_message']}\nAi: {msg['ai_reply']}"
-                for msg in self.pending_messages
+                for msg in messages
             )
             
             summary = self._generate_summary(conversation_text)
@@ -55,6 +215,9 @@ class MemoryHandler:
                 summary = summary[:self.summary_max_length-3] + "..."
             
             summary_embedding = self.get_embedding(summary)
+            if not summary_embedding:
+                # The job stays queued and is retried; an unembedded summary would never be found
+                raise RuntimeError("summary embedding failed")
             
             summary_entry = {
                 "start_timestamp": first_timestamp,
@@ -62,36 +225,49 @@ class MemoryHandler:
                 "summary": summary
             }
             
-            embedding_entry = {
-                "start_timestamp": first_timestamp,
-                "end_timestamp": last_timestamp,
-                "embedding": summary_embedding
-            }
-            
-            with open(self.summary_log_file, "a", encoding="utf-8") as file:
-                file.write(json.dumps(summary_entry, ensure_ascii=False) + "\n")
+            with self._lock:
+                store_row = self._store_summary(summary_entry, summary_embedding)
                 
-            with open(self.embeddings_file, "a", encoding="utf-8") as file:
-                file.write(json.dumps(embedding_entry, ensure_ascii=False) + "\n")
+                if self._index is not None:
+                    self._add_to_index({**summary_entry, "embedding": summary_embedding}, store_row)
+                    self._add_to_lexical_index(summary_entry)
+                    self._schedule_ann_training()
             
-            self.pending_messages = []
             return True
             
         except Exception as e:
             print(f"Error creating summary: {str(e)}")
             return False
     
+    def _store_summary(self, summary_entry: Dict, embedding: List[float]) -> Optional[int]:
+        start_timestamp = summary_entry["start_timestamp"]
+        end_timestamp = summary_entry["end_timestamp"]
+        if self.sqlite_store is not None:
+            return self.sqlite_store.append(start_timestamp, end_timestamp, summary_entry["summary"], embedding)
+        
+        with open(self.summary_log_file, "a", encoding="utf-8") as file:
+            file.write(json.dumps(summary_entry, ensure_ascii=False) + "\n")
+        
+        if self.embedding_store is not None:
+            if embedding:
+                return self.embedding_store.append(start_timestamp, end_timestamp, embedding)
+            return None
+        
+        embedding_entry = {
+            "start_timestamp": start_timestamp,
+            "end_timestamp": end_timestamp,
+            "embedding": embedding
+        }
+        with open(self.embeddings_file, "a", encoding="utf-8") as file:
+            file.write(json.dumps(embedding_entry, ensure_ascii=False) + "\n")
+        return None
+    
     def get_embedding(self, text: str) -> List[float]:
-        try:
-            response = ollama.embeddings(model='nomic-embed-text', prompt=text)
-            return response['embedding']
-        except Exception as e:
-            print(f"Embedding error: {str(e)}")
-            return []
+        return self.embedding_service.get_embedding(text)
     
     def _generate_summary(self, conversation_text: str) -> str:
-        try:
-            prompt = f"""Create a concise summary in Russian of the following conversation between user and AI.
+        # Errors propagate so the job is kept for a retry instead of storing the error text
+        prompt = f"""Create a concise summary in Russian of the following conversation between user and AI.
 Highlight key user information, interests, and important topics.
 Summary should be no more than {self.summary_max_length} characters.
 
@@ -99,48 +275,230 @@ Conversation:
 {conversation_text}
 
 Summary:"""
-            
-            response = ollama.generate(
-                model="llama3",
-                prompt=prompt,
-                options={"temperature": 0.5}
-            )
-            return response['response'].strip()
+        
+        options = {"temperature": 0.5}
+        if self.num_ctx is not None:
+            options["num_ctx"] = self.num_ctx
+        response = self.backend.generate(
+            model="llama3",
+            prompt=prompt,
+            options=options,
+            keep_alive=self.keep_alive
+        )
+        return response['response'].strip()
+    
+    def _load_index(self) -> VectorIndex:
+        with self._lock:
+            if self._index is None:
+                self._index = self._create_index()
+                self._indexed_summaries = []
+                self._store_rows = []
+                self._index_rows = {}
+                self._lexical_index = BM25Index()
+                self._lexical_summaries = []
+                self._lexical_rows = {}
+                if self.embedding_store is not None:
+                    self._load_index_from_store()
+                elif self.sqlite_store is not None:
+                    self._load_index_from_sqlite()
+                else:
+                    for summary in self.load_summaries_and_embeddings():
+                        self._add_to_index(summary)
+                        self._add_to_lexical_index(summary)
+                if isinstance(self._index, IVFIndex):
+                    self._index.load(self.ann_index_file)
+                    self._schedule_ann_training()
+            return self._index
+    
+    def _create_index(self) -> VectorIndex:
+        if self.retrieval_backend == "ivf":
+            if self.quantization:
+                print("Quantization is not supported with the IVF backend, using full precision")
+            return IVFIndex()
+        if self.quantization:
+            # Re-ranking reads full-precision rows back from disk; without a store to read them
+            # from, the codes would only add to the float32 matrix
+            if self.embedding_store is not None:
+                return QuantizedIndex(self.quantization, self.rerank_size,
+                                      lambda rows: self.embedding_store.vectors()[[self._store_rows[row] for row in rows]])
+            if self.sqlite_store is not None:
+                return QuantizedIndex(self.quantization, self.rerank_size,
+                                      lambda rows: self.sqlite_store.vectors_for([self._store_rows[row] for row in rows]))
+            print("Quantization needs the binary or sqlite storage backend, using full precision")
+        if self.embedding_store is not None:
+            # Rows are stored normalized, so queries are scored against the memory map itself
+            return MappedVectorIndex(self.embedding_store.vectors)
+        return VectorIndex()
+    
+    def _schedule_ann_training(self):
+        # k-means takes seconds on a long history, so it never runs on the query path;
+        # the IVF index answers exactly until the trained lists are installed
+        index = self._index
+        if not isinstance(index, IVFIndex) or not index.needs_training():
+            return
+        if self._trainer is not None and self._trainer.is_alive():
+            return
+        self._trainer = threading.Thread(target=self._train_ann_index, args=(index,), daemon=True)
+        self._trainer.start()
+
+    def _train_ann_index(self, index: IVFIndex):
+        with self._lock:
+            vectors = index.vectors
+        try:
+            centroids, assignments = index.fit(vectors)
         except Exception as e:
-            print(f"Summary generation error: {str(e)}")
-            return f"Summary error: {str(e)}"
-    
-    def find_relevant_context(self, user_input: str, max_results: int = 2) -> List[Dict]:
-        relevant_context = []
-        user_embedding = self.get_embedding(user_input)
-        if not user_embedding:
-            return relevant_context
-            
-        summaries = self.load_summaries_and_embeddings()
+            print(f"Error training ANN index: {str(e)}")
+            return
+        with self._lock:
+            if self._index is index:
+                index.install(centroids, assignments)
+
+    def save_index(self):
+        with self._lock:
+            if isinstance(self._index, IVFIndex):
+                try:
+                    self._index.save(self.ann_index_file)
+                except Exception as e:
+                    print(f"Error saving ANN index: {str(e)}")
+    
+    def _load_index_from_store(self):
+        row_lookup = self.embedding_store.row_lookup()
+        rows = []
+        for key, summary in self._load_summaries().items():
+            self._add_to_lexical_index(summary)
+            if key in row_lookup:
+                rows.append(row_lookup[key])
+                self._store_rows.append(row_lookup[key])
+                self._index_rows[key] = len(self._indexed_summaries)
+                self._indexed_summaries.append(self._summary_fields(summary))
+        if not rows:
+            return
+        if isinstance(self._index, MappedVectorIndex):
+            self._index.add_rows(rows)
+        else:
+            self._index.add_many(self.embedding_store.vectors()[rows])
+    
+    def _load_index_from_sqlite(self):
+        for entry in self.sqlite_store.entries(include_embeddings=False):
+            self._add_to_lexical_index(entry)
+        entries, vectors = self.sqlite_store.load_vectors()
+        for entry in entries:
+            self._store_rows.append(entry["id"])
+            self._index_rows[f"{entry['start_timestamp']}_{entry['end_timestamp']}"] = len(self._indexed_summaries)
+            self._indexed_summaries.append(self._summary_fields(entry))
+        if entries:
+            self._index.add_many(vectors)
+    
+    @staticmethod
+    def _summary_fields(summary: Dict) -> Dict:
+        return {
+            "summary": summary.get("summary", ""),
+            "start_timestamp": summary.get("start_timestamp", ""),
+            "end_timestamp": summary.get("end_timestamp", "")
+        }
+
+    def _add_to_index(self, summary: Dict, store_row: Optional[int] = None):
+        embedding = summary.get("embedding", [])
+        if not self._index.accepts(embedding):
+            return
+        mapped = isinstance(self._index, MappedVectorIndex)
+        if mapped and store_row is None:
+            return
+        # A replayed summary job stores the same (start, end) again; its row is updated in place
+        key = f"{summary.get('start_timestamp')}_{summary.get('end_timestamp')}"
+        row = self._index_rows.get(key)
+        if row is not None:
+            if mapped:
+                self._index.replace_row(row, store_row)
+            else:
+                self._index.replace(row, embedding)
+            self._store_rows[row] = store_row
+            self._indexed_summaries[row] = self._summary_fields(summary)
+            return
+        if mapped:
+            self._index.add_rows([store_row])
+        else:
+            self._index.add(embedding)
+        self._index_rows[key] = len(self._indexed_summaries)
+        self._store_rows.append(store_row)
+        self._indexed_summaries.append(self._summary_fields(summary))
+
+    def _add_to_lexical_index(self, summary: Dict):
+        key = f"{summary.get('start_timestamp')}_{summary.get('end_timestamp')}"
+        doc_id = self._lexical_rows.get(key)
+        if doc_id is not None:
+            self._lexical_index.replace(doc_id, summary.get("summary", ""), self._lexical_summaries[doc_id]["summary"])
+            self._lexical_summaries[doc_id] = self._summary_fields(summary)
+            return
+        self._lexical_rows[key] = self._lexical_index.add(summary.get("summary", ""))
+        self._lexical_summaries.append(self._summary_fields(summary))
+    
+    def reload_index(self, discard_saved: bool = False):
+        with self._lock:
+            if discard_saved and os.path.exists(self.ann_index_file):
+                os.remove(self.ann_index_file)
+            self._index = None
+            self._indexed_summaries = []
+            self._store_rows = []
+            self._index_rows = {}
+            self._lexical_index = None
+            self._lexical_summaries = []
+            self._lexical_rows = {}
+    
+    def find_relevant_context(self, user_input: str, max_results: int = 2, lexical_only: bool = False,
+                              query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        if lexical_only:
+            user_embedding = []
+        else:
+            # An empty query_embedding is a failed attempt by the caller; lexical search still runs
+            user_embedding = query_embedding if query_embedding is not None else self.get_embedding(user_input)
+        candidates = max_results * self.fusion_candidates
         
-        for summary in summaries:
-            embedding = summary.get("embedding", [])
-            if not embedding:
-                continue
-                
-            try:
-                similarity = cosine_similarity([user_embedding], [embedding])[0][0]
-                if similarity > 0.7:
-                    relevant_context.append({
-                        "summary": summary.get("summary", ""),
-                        "similarity": similarity,
-                        "start_timestamp": summary.get("start_timestamp", ""),
-                        "end_timestamp": summary.get("end_timestamp", "")
-                    })
-            except ValueError:
-                continue
+        with self._lock:
+            index = self._load_index()
+            vector_results = []
+            if user_embedding:
+                vector_results = [
+                    {**self._indexed_summaries[row], "similarity": similarity}
+                    for row, similarity in index.search(user_embedding, candidates, self.similarity_threshold)
+                ]
+            
+            lexical_results = []
+            if self.hybrid_retrieval or not user_embedding:
+                lexical_results = [
+                    {**self._lexical_summaries[doc_id], "lexical_score": score}
+                    for doc_id, score in self._lexical_index.search(user_input, candidates, self.lexical_min_score)
+                ]
         
-        return sorted(relevant_context, key=lambda x: x["similarity"], reverse=True)[:max_results]
+        if not lexical_results:
+            return vector_results[:max_results]
+        return self._fuse_results(vector_results, lexical_results)[:max_results]
     
-    def load_summaries_and_embeddings(self) -> List[Dict]:
+    def _fuse_results(self, vector_results: List[Dict], lexical_results: List[Dict]) -> List[Dict]:
+        fused = {}
+        for results in [vector_results, lexical_results]:
+            for rank, result in enumerate(results):
+                key = (result["start_timestamp"], result["end_timestamp"])
+                entry = fused.setdefault(key, {
+                    "summary": result["summary"],
+                    "start_timestamp": result["start_timestamp"],
+                    "end_timestamp": result["end_timestamp"],
+                    "similarity": 0.0,
+                    "lexical_score": 0.0,
+                    "score": 0.0
+                })
+                entry["similarity"] = max(entry["similarity"], result.get("similarity", 0.0))
+                entry["lexical_score"] = max(entry["lexical_score"], result.get("lexical_score", 0.0))
+                entry["score"] += 1.0 / (self.fusion_rank_constant + rank + 1)
+        return sorted(fused.values(), key=lambda x: x["score"], reverse=True)
+    
+    def _load_summaries(self) -> Dict[str, Dict]:
         summaries = {}
-        embeddings = {}
-        
+        if self.sqlite_store is not None:
+            for entry in self.sqlite_store.entries(include_embeddings=False):
+                key = f"{entry['start_timestamp']}_{entry['end_timestamp']}"
+                summaries[key] = entry
+            return summaries
         try:
             with open(self.summary_log_file, "r", encoding="utf-8") as file:
                 for line in file:
@@ -150,16 +508,39 @@ Summary:"""
                         summaries[key] = entry
         except Exception as e:
             print(f"Error loading summaries: {str(e)}")
-        
+        return summaries
+    
+    def _load_jsonl_embeddings(self) -> List[Dict]:
+        entries = []
         try:
             with open(self.embeddings_file, "r", encoding="utf-8") as file:
                 for line in file:
                     if line.strip():
-                        entry = json.loads(line)
-                        key = f"{entry.get('start_timestamp')}_{entry.get('end_timestamp')}"
-                        embeddings[key] = entry.get("embedding", [])
+                        entries.append(json.loads(line))
         except Exception as e:
             print(f"Error loading embeddings: {str(e)}")
+        return entries
+    
+    def load_summaries_and_embeddings(self) -> List[Dict]:
+        if self.sqlite_store is not None:
+            return [
+                {key: entry[key] for key in ["summary", "start_timestamp", "end_timestamp", "embedding"]}
+                for entry in self.sqlite_store.entries()
+            ]
+        
+        summaries = self._load_summaries()
+        
+        if self.embedding_store is not None:
+            row_lookup = self.embedding_store.row_lookup()
+            embeddings = {
+                key: self.embedding_store.embedding(row)
+                for key, row in row_lookup.items() if key in summaries
+            }
+        else:
+            embeddings = {}
+            for entry in self._load_jsonl_embeddings():
+                key = f"{entry.get('start_timestamp')}_{entry.get('end_timestamp')}"
+                embeddings[key] = entry.get("embedding", [])
         
         result = []
         for key, summary in summaries.items():
@@ -172,6 +553,72 @@ Summary:"""
         
         return result
     
+    def migrate_embeddings_to_binary(self) -> int:
+        if self.embedding_store is None:
+            raise ValueError("Binary embedding storage is not enabled")
+        if not os.path.exists(self.embeddings_file):
+            return 0
+        with self._lock:
+            migrated = self.embedding_store.rewrite(self._load_jsonl_embeddings())
+            os.remove(self.embeddings_file)
+            self.reload_index(discard_saved=True)
+        return migrated
+    
+    def summaries_between(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        if self.sqlite_store is not None:
+            return self.sqlite_store.entries(start, end, include_embeddings=False)
+        return sorted(
+            (
+                summary for summary in self._load_summaries().values()
+                if (start is None or summary.get("end_timestamp", "") >= start)
+                and (end is None or summary.get("start_timestamp", "") <= end)
+            ),
+            key=lambda x: x.get("start_timestamp", "")
+        )
+    
+    def import_jsonl_to_sqlite(self) -> int:
+        if self.sqlite_store is None:
+            raise ValueError("SQLite storage is not enabled")
+        with self._lock:
+            imported = self.sqlite_store.import_jsonl(self.summary_log_file, self.embeddings_file)
+            for file_path in [self.summary_log_file, self.embeddings_file]:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+            self.reload_index(discard_saved=True)
+        return imported
+    
+    def compact_embeddings(self, dtype: Optional[str] = None) -> int:
+        if self.embedding_store is None:
+            raise ValueError("Binary embedding storage is not enabled")
+        with self._lock:
+            removed = self.embedding_store.compact(set(self._load_summaries()), dtype=dtype)
+            self.reload_index(discard_saved=True)
+        return removed
+    
+    def reload_history(self):
+        self.flush_summaries()
+        self._ensure_log_files()
+        self._migrate_pending_jsonl()
+        self.reload_index(discard_saved=True)
+    
+    def clear_history(self):
+        self.flush_summaries()
+        with self._lock:
+            if self.sqlite_store is not None:
+                self.sqlite_store.replace_all([])
+                self.reload_index(discard_saved=True)
+                return
+            with open(self.summary_log_file, "w", encoding="utf-8") as file:
+                file.write("")
+            if self.embedding_store is not None:
+                self.embedding_store.rewrite([])
+            else:
+                with open(self.embeddings_file, "w", encoding="utf-8") as file:
+                    file.write("")
+            self.reload_index(discard_saved=True)
+    
     def finalize(self):
-        if self.pending_messages:
-            self.create_and_save_summary()
\ No newline at end of file
+        self._submit_pending_messages()
+        self.flush_summaries()
+        self._stop_worker()
+        self.save_index()
\ No newline at end of file
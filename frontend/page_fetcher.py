@@ -0,0 +1,151 @@
+import time
+import codecs
+import threading
+import requests
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Dict, Optional
+from markdown_chunker import estimate_tokens
+from rate_limiter import RateLimiter
+
+SKIPPED_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form", "iframe"}
+BLOCK_TAGS = {"p", "div", "li", "h1", "h2", "h3", "h4", "h5", "h6", "article", "section", "main",
+              "blockquote", "pre", "tr", "td", "br", "dd", "dt"}
+
+class _TextExtractor(HTMLParser):
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.blocks = []
+        self.size = 0
+        self._current = []
+        self._skip_depth = 0
+
+    @property
+    def full(self) -> bool:
+        return self.size >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._skip_depth == 0 and not self.full:
+            self._current.append(data)
+
+    def _flush(self):
+        text = " ".join("".join(self._current).split())
+        self._current = []
+        # Menus and buttons are short fragments, real content comes in sentences
+        if len(text) >= 40 and not self.full:
+            text = text[:self.max_chars - self.size]
+            self.blocks.append(text)
+            self.size += len(text)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+class PageFetcher:
+    def __init__(self, session: requests.Session, max_workers: int = 4, timeout: float = 5.0,
+                 max_bytes: int = 1024 * 1024, max_chars: int = 40000, passage_tokens: int = 200,
+                 max_passages: int = 12, rate_limiter: Optional[RateLimiter] = None):
+        self.session = session
+        self.rate_limiter = rate_limiter or RateLimiter(rate=2.0, capacity=4)
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.passage_tokens = passage_tokens
+        self.max_passages = max_passages
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def fetch_many(self, urls: List[str], budget: float) -> Dict[str, List[str]]:
+        deadline = time.monotonic() + budget
+        cancel_event = threading.Event()
+        futures = {self._executor.submit(self._fetch_page, url, deadline, cancel_event): url for url in urls}
+        done, _ = wait(futures, timeout=budget)
+        # Pages still downloading are abandoned; their workers notice the flag on the next chunk
+        cancel_event.set()
+
+        passages = {}
+        for future in done:
+            try:
+                page_passages = future.result()
+            except Exception as e:
+                print(f"Page fetch error for {futures[future]}: {str(e)}")
+                continue
+            if page_passages:
+                passages[futures[future]] = page_passages
+        return passages
+
+    def _fetch_page(self, url: str, deadline: float, cancel_event: threading.Event) -> List[str]:
+        if not self.rate_limiter.acquire(url, max(0.0, deadline - time.monotonic())):
+            return []
+        timeout = min(self.timeout, max(0.1, deadline - time.monotonic()))
+        with self.session.get(url, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "text/html")
+            if "html" not in content_type:
+                return []
+            # requests assumes latin-1 for text/* without a charset, but pages without one are nearly always UTF-8
+            encoding = response.encoding if "charset" in content_type.lower() else "utf-8"
+            decoder = codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+            extractor = _TextExtractor(self.max_chars)
+            received = 0
+            for chunk in response.iter_content(chunk_size=16384):
+                if cancel_event.is_set() or time.monotonic() > deadline:
+                    break
+                received += len(chunk)
+                extractor.feed(decoder.decode(chunk))
+                if received >= self.max_bytes or extractor.full:
+                    break
+            extractor.feed(decoder.decode(b"", final=True))
+            extractor.close()
+        # Embedding every passage of a long page would eat the latency budget; the lead text matters most
+        return self._split_passages(extractor.blocks)[:self.max_passages]
+
+    def _split_passages(self, blocks: List[str]) -> List[str]:
+        passages = []
+        current = []
+        current_tokens = 0
+        for block in blocks:
+            for piece in self._split_block(block):
+                tokens = estimate_tokens(piece)
+                if current and current_tokens + tokens > self.passage_tokens:
+                    passages.append("\n".join(current))
+                    current = []
+                    current_tokens = 0
+                current.append(piece)
+                current_tokens += tokens
+        if current:
+            passages.append("\n".join(current))
+        return passages
+
+    def _split_block(self, block: str) -> List[str]:
+        if estimate_tokens(block) <= self.passage_tokens:
+            return [block]
+        pieces = []
+        words = []
+        tokens = 0
+        for word in block.split():
+            word_tokens = estimate_tokens(word)
+            if words and tokens + word_tokens > self.passage_tokens:
+                pieces.append(" ".join(words))
+                words = []
+                tokens = 0
+            words.append(word)
+            tokens += word_tokens
+        if words:
+            pieces.append(" ".join(words))
+        return pieces
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,84 @@
+from typing import List, Dict, Tuple
+from markdown_chunker import estimate_tokens
+
+# Role markers and separators the chat template adds around every message
+MESSAGE_OVERHEAD = 8
+
+class PromptBuilder:
+    def __init__(self, context_window: int = 8192, reply_tokens: int = 1024,
+                 history_share: float = 0.4, min_history_messages: int = 2, trim_ratio: float = 0.5):
+        self.context_window = context_window
+        self.reply_tokens = reply_tokens
+        self.history_share = history_share
+        self.min_history_messages = min_history_messages
+        self.trim_ratio = trim_ratio
+
+    @staticmethod
+    def count(text: str) -> int:
+        return estimate_tokens(text) + MESSAGE_OVERHEAD
+
+    def build(self, system_message: Dict, history: List[Dict], context_items: List[Dict],
+              sections: List[Tuple[str, str]]) -> Tuple[Dict, List[Dict], Dict]:
+        # context_items: {"source", "text", "score"}; notices (score None) are always kept.
+        # Returns the context message (or None), the history that fits and a report of what was dropped.
+        system_tokens = self.count(system_message["content"])
+        budget = self.context_window - self.reply_tokens - system_tokens
+        report = {"budget": budget, "history": 0, "context": 0, "dropped": []}
+
+        # Newest messages first; the current question is always kept. History that overflows is
+        # cut down to trim_ratio of its budget, so the kept part can grow for several turns and
+        # stays the same prompt prefix instead of losing one message every turn
+        history_budget = max(0, int(budget * self.history_share))
+        if sum(self.count(message["content"]) for message in history) > history_budget:
+            history_budget = int(history_budget * self.trim_ratio)
+        kept_history = []
+        history_tokens = 0
+        for position, message in enumerate(reversed(history)):
+            tokens = self.count(message["content"])
+            required = position < self.min_history_messages
+            if not required and history_tokens + tokens > history_budget:
+                report["dropped"].extend(
+                    {"source": "history", "text": older["content"][:80], "tokens": self.count(older["content"])}
+                    for older in reversed(history[:len(history) - position])
+                )
+                break
+            kept_history.insert(0, message)
+            history_tokens += tokens
+        report["history"] = history_tokens
+
+        # Scores from different sources are not on one scale, so sources take turns by rank
+        # and the score orders items of equal rank
+        ranks = {}
+        ranked = []
+        for item in context_items:
+            rank = ranks.get(item["source"], 0)
+            ranks[item["source"]] = rank + 1
+            priority = -1 if item.get("score") is None else rank
+            ranked.append((priority, -(item.get("score") or 0.0), len(ranked), item))
+        ranked.sort(key=lambda entry: entry[:3])
+
+        context_budget = budget - history_tokens - MESSAGE_OVERHEAD
+        headers = {source: estimate_tokens(header) + 1 for source, header in sections}
+        kept = set()
+        used = 0
+        opened = set()
+        for _, _, _, item in ranked:
+            tokens = estimate_tokens(item["text"]) + 1
+            if item["source"] not in opened:
+                tokens += headers.get(item["source"], 0)
+            if used + tokens > context_budget:
+                report["dropped"].append({"source": item["source"], "text": item["text"][:80], "tokens": tokens})
+                continue
+            kept.add(id(item))
+            opened.add(item["source"])
+            used += tokens
+        report["context"] = used
+
+        blocks = []
+        for source, header in sections:
+            lines = [item["text"] for item in context_items if item["source"] == source and id(item) in kept]
+            if lines:
+                blocks.append(header + ("\n" if header else "") + "\n".join(lines))
+        context_message = {"role": "system", "content": "\n".join(blocks)} if blocks else None
+        report["prompt_tokens"] = system_tokens + history_tokens + (self.count(context_message["content"]) if blocks else 0)
+        return context_message, kept_history, report
@@ -0,0 +1,171 @@
+import numpy as np
+from typing import List, Tuple, Optional, Sequence, Callable
+from vector_index import VectorIndex
+
+if hasattr(np, "bitwise_count"):
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT_TABLE = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+    def _popcount(values):
+        return _POPCOUNT_TABLE[values]
+
+# Largest dimension whose int8 dot products (at most 127 * 127 per term) float32 sums exactly
+EXACT_FLOAT_DIMENSION = 2 ** 24 // (127 * 127)
+
+class QuantizedIndex(VectorIndex):
+    MODES = ("int8", "binary")
+    # How far below the threshold an approximate score may fall and still hide an exact match
+    THRESHOLD_MARGINS = {"int8": 0.02, "binary": 0.12}
+
+    def __init__(self, quantization: str = "int8", rerank_size: int = 256,
+                 full_precision_source: Optional[Callable[[np.ndarray], np.ndarray]] = None,
+                 dimension: Optional[int] = None, block_size: int = 256):
+        if quantization not in self.MODES:
+            raise ValueError(f"Unknown quantization mode: {quantization}")
+        # Keeping a float32 copy next to the codes would use more memory than no quantization
+        if full_precision_source is None:
+            raise ValueError("Quantization needs a full-precision source outside the index")
+        super().__init__(dimension)
+        self.quantization = quantization
+        self.rerank_size = rerank_size
+        self.full_precision_source = full_precision_source
+        self.threshold_margin = self.THRESHOLD_MARGINS[quantization]
+        self.block_size = block_size
+        self._codes = None
+        self._scales = np.zeros(0, dtype=np.float32)
+
+    @staticmethod
+    def _quantize_int8(normalized: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        scales = np.abs(normalized).max(axis=-1) / 127.0
+        scales = np.where(scales == 0, 1.0, scales)
+        codes = np.clip(np.round(normalized / np.expand_dims(scales, -1)), -127, 127).astype(np.int8)
+        return codes, np.asarray(scales, dtype=np.float32)
+
+    def _encode(self, normalized: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self.quantization == "binary":
+            return np.packbits(normalized > 0, axis=1), np.ones(len(normalized), dtype=np.float32)
+        return self._quantize_int8(normalized)
+
+    def _append_codes(self, codes: np.ndarray, scales: np.ndarray, start: int):
+        required = start + len(codes)
+        if self._codes is None:
+            self._codes = np.zeros((max(self._capacity, required), codes.shape[1]), dtype=codes.dtype)
+            self._scales = np.zeros(len(self._codes), dtype=np.float32)
+        elif required > len(self._codes):
+            capacity = len(self._codes)
+            while capacity < required:
+                capacity *= 2
+            grown_codes = np.zeros((capacity, codes.shape[1]), dtype=codes.dtype)
+            grown_codes[:start] = self._codes[:start]
+            grown_scales = np.zeros(capacity, dtype=np.float32)
+            grown_scales[:start] = self._scales[:start]
+            self._codes, self._scales = grown_codes, grown_scales
+        self._codes[start:required] = codes
+        self._scales[start:required] = scales
+
+    def add(self, embedding: Sequence[float]) -> int:
+        if not self.accepts(embedding):
+            raise ValueError(f"Embedding dimension {len(embedding) if embedding is not None else 0} does not match index dimension {self.dimension}")
+        return self.add_many([embedding])[0]
+
+    def add_many(self, embeddings: Sequence[Sequence[float]]) -> List[int]:
+        if len(embeddings) == 0:
+            return []
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or (self.dimension is not None and matrix.shape[1] != self.dimension):
+            raise ValueError("Embeddings do not match index dimension")
+
+        # Only the codes stay resident; full-precision rows are read back from the source
+        start = self.size
+        codes, scales = self._encode(self.normalize(matrix))
+        self.dimension = self.dimension or matrix.shape[1]
+        self.size += len(matrix)
+        self._append_codes(codes, scales, start)
+        return list(range(start, self.size))
+
+    def replace(self, row: int, embedding: Sequence[float]):
+        if not self.accepts(embedding):
+            raise ValueError(f"Embedding dimension {len(embedding) if embedding is not None else 0} does not match index dimension {self.dimension}")
+        codes, scales = self._encode(self.normalize([embedding]))
+        self._codes[row] = codes[0]
+        self._scales[row] = scales[0]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self.full_precision(np.arange(self.size))
+
+    def full_precision(self, rows: np.ndarray) -> np.ndarray:
+        return self.normalize(self.full_precision_source(rows))
+
+    def resident_bytes(self) -> int:
+        if self._codes is None:
+            return 0
+        return self._codes[:self.size].nbytes + self._scales[:self.size].nbytes
+
+    def approximate_scores(self, query: Sequence[float]) -> np.ndarray:
+        if self.size == 0 or not self.accepts(query):
+            return np.zeros(0, dtype=np.float32)
+        normalized_query = self.normalize(query)
+
+        if self.quantization == "binary":
+            query_bits = np.packbits(normalized_query > 0)
+            distances = np.empty(self.size, dtype=np.int32)
+            for start in range(0, self.size, self.block_size):
+                block = self._codes[start:min(start + self.block_size, self.size)]
+                distances[start:start + len(block)] = _popcount(np.bitwise_xor(block, query_bits)).sum(axis=1, dtype=np.int32)
+            # The share of differing sign bits estimates the angle between the vectors
+            return np.cos(np.pi * distances / self.dimension).astype(np.float32)
+
+        # The query is quantized too, so the first pass is an integer dot product of int8 codes.
+        # Up to EXACT_FLOAT_DIMENSION every partial sum stays below 2**24, where float32 holds
+        # integers exactly, so BLAS gives the same result as int32 accumulation, only faster.
+        query_codes, query_scale = self._quantize_int8(normalized_query)
+        exact_in_float = self.dimension <= EXACT_FLOAT_DIMENSION
+        if exact_in_float:
+            query_codes = query_codes.astype(np.float32)
+        dots = np.empty(self.size, dtype=np.float32 if exact_in_float else np.int32)
+        for start in range(0, self.size, self.block_size):
+            end = min(start + self.block_size, self.size)
+            if exact_in_float:
+                np.matmul(self._codes[start:end].astype(np.float32), query_codes, out=dots[start:end])
+            else:
+                np.einsum("ij,j->i", self._codes[start:end], query_codes, dtype=np.int32, out=dots[start:end])
+        return dots * (self._scales[:self.size] * query_scale)
+
+    def scores(self, query: Sequence[float]) -> np.ndarray:
+        if self.size == 0 or not self.accepts(query):
+            return np.zeros(0, dtype=np.float32)
+        return self.full_precision(np.arange(self.size)) @ self.normalize(query)
+
+    def search(self, query: Sequence[float], top_k: int, threshold: Optional[float] = None) -> List[Tuple[int, float]]:
+        approximate = self.approximate_scores(query)
+        if approximate.size == 0 or top_k <= 0:
+            return []
+
+        normalized_query = self.normalize(query)
+        shortlist_size = min(max(self.rerank_size, top_k), approximate.size)
+        while True:
+            if shortlist_size < approximate.size:
+                shortlist = np.argpartition(-approximate, shortlist_size - 1)[:shortlist_size]
+            else:
+                shortlist = np.arange(approximate.size)
+            # Every row left out scores at most the shortlist's lowest approximate score; while that
+            # could still hide an exact score above the threshold, the shortlist is doubled
+            if (threshold is None or shortlist_size == approximate.size
+                    or approximate[shortlist].min() < threshold - self.threshold_margin):
+                break
+            shortlist_size = min(shortlist_size * 2, approximate.size)
+        shortlist = np.sort(shortlist)
+
+        # Thresholds and ordering are applied to exact scores only, so results keep full-precision semantics
+        exact = self.full_precision(shortlist) @ normalized_query
+        order = np.argsort(-exact, kind="stable")[:top_k]
+
+        results = []
+        for position in order:
+            score = float(exact[position])
+            if threshold is not None and score <= threshold:
+                break
+            results.append((int(shortlist[position]), score))
+        return results
@@ -0,0 +1,83 @@
+import time
+import asyncio
+import threading
+from urllib.parse import urlparse
+from typing import Callable, Dict, Optional, Tuple
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def expected_wait(self, now: float) -> float:
+        self._refill(now)
+        return max(0.0, (1.0 - self._tokens) / self.rate)
+
+    def reserve(self, now: float) -> float:
+        # Tokens may go negative: each caller takes the next slot, so waiters are served in arrival order
+        wait = self.expected_wait(now)
+        self._tokens -= 1.0
+        return wait
+
+class RateLimiter:
+    def __init__(self, rate: float = 0.5, capacity: float = 1.0,
+                 host_limits: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.host_limits = host_limits or {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url_or_host: str) -> str:
+        if "://" in url_or_host:
+            return urlparse(url_or_host).netloc.lower()
+        return url_or_host.lower()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate, capacity = self.host_limits.get(host, (self.rate, self.capacity))
+            bucket = self._buckets[host] = TokenBucket(rate, capacity)
+        return bucket
+
+    def expected_wait(self, url_or_host: str) -> float:
+        with self._lock:
+            return self._bucket(self.host_of(url_or_host)).expected_wait(time.monotonic())
+
+    def reserve(self, url_or_host: str, max_wait: Optional[float] = None) -> Optional[float]:
+        # Returns the delay before the caller may proceed, or None if that would exceed max_wait
+        with self._lock:
+            bucket = self._bucket(self.host_of(url_or_host))
+            now = time.monotonic()
+            if max_wait is not None and bucket.expected_wait(now) > max_wait:
+                return None
+            return bucket.reserve(now)
+
+    def acquire(self, url_or_host: str, timeout: Optional[float] = None) -> bool:
+        wait = self.reserve(url_or_host, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, url_or_host: str, timeout: Optional[float] = None) -> bool:
+        wait = self.reserve(url_or_host, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    def call_when_ready(self, url_or_host: str, callback: Callable[[], None]) -> threading.Timer:
+        timer = threading.Timer(self.reserve(url_or_host), callback)
+        timer.daemon = True
+        timer.start()
+        return timer
@@ -0,0 +1,104 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError
+from typing import Callable, Dict, List, Optional
+from embedding_service import EmbeddingService
+
+class RetrievalStage:
+    def __init__(self, embedding_service: EmbeddingService, deadlines: Optional[Dict[str, float]] = None):
+        self.embedding_service = embedding_service
+        # Seconds per source from when it can start, i.e. once the query embedding is ready;
+        # "embedding" bounds the embedding itself. Web search includes the rate limiter wait.
+        self.deadlines = {"embedding": 5.0, "files": 3.0, "memory": 3.0, "web": 12.0}
+        if deadlines:
+            self.deadlines.update(deadlines)
+        # A query embedding slower than this means Ollama is busy (usually generating);
+        # sources with a lexical fallback then answer without waiting for it
+        self.lexical_after = 0.5
+        self.last_timings = {}
+        # Spare workers so a source still running past its deadline does not hold up the next turn
+        self._executor = ThreadPoolExecutor(max_workers=6)
+
+    def run(self, user_input: str, sources: Dict[str, Callable[[str, List[float]], object]],
+            lexical_sources: Optional[Dict[str, Callable[[str], object]]] = None) -> Dict[str, Dict]:
+        # Every source gets the same query embedding; a source that misses its deadline is left
+        # running in the background and reported as "timeout"
+        started = time.monotonic()
+        lexical_sources = lexical_sources or {}
+        arrival = {}
+
+        def embed():
+            embedding = self.embedding_service.get_embedding(user_input)
+            arrival["at"] = time.monotonic()
+            return embedding
+
+        embedding_future = self._executor.submit(embed) if sources else None
+        try:
+            query_embedding = embedding_future.result(timeout=self.lexical_after) if sources else []
+        except TimeoutError:
+            query_embedding = None
+        embedded = time.monotonic()
+        embedding_deadline = started + self.deadlines.get("embedding", 5.0)
+
+        futures = {}
+        clocks = {}
+        for name, source in sources.items():
+            if query_embedding is None and name in lexical_sources:
+                lexical_source = lexical_sources[name]
+                source = lambda text, _, lexical_source=lexical_source: lexical_source(text)
+            elif query_embedding is None:
+                # The embedding is still on its way; this source waits for it on its own worker
+                source = lambda text, _, source=source: source(
+                    text, embedding_future.result(timeout=max(0.0, embedding_deadline - time.monotonic()))
+                )
+            future = self._executor.submit(self._timed, source, user_input, query_embedding)
+            futures[future] = name
+            if query_embedding is not None or name in lexical_sources:
+                clocks[future] = embedded
+
+        def deadline(future) -> float:
+            # A source's own deadline counts from when it could start, so a slow embedding
+            # does not use it up; the embedding itself has a separate budget
+            limit = self.deadlines.get(futures[future], 5.0)
+            if future in clocks:
+                return clocks[future] + limit
+            if "at" in arrival:
+                return arrival["at"] + limit
+            return embedding_deadline
+
+        results = {name: {"status": "timeout", "value": None} for name in sources}
+        pending = set(futures)
+        while pending:
+            # The embedding arriving moves the deadlines of the sources waiting for it
+            watched = pending if embedding_future.done() else pending | {embedding_future}
+            timeout = max(0.0, min(deadline(future) for future in pending) - time.monotonic())
+            done, _ = wait(watched, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done & pending:
+                name = futures[future]
+                try:
+                    value, elapsed = future.result()
+                    results[name] = {"status": "ok", "value": value, "elapsed": elapsed}
+                except TimeoutError:
+                    # The query embedding did not arrive within its budget
+                    results[name] = {"status": "timeout", "value": None}
+                except Exception as e:
+                    print(f"Retrieval error in {name}: {str(e)}")
+                    results[name] = {"status": "error", "value": None}
+            now = time.monotonic()
+            pending = {future for future in pending - done if deadline(future) > now}
+
+        self.last_timings = {
+            "embedding": arrival.get("at", embedded) - started,
+            "lexical_only": query_embedding is None,
+            "total": time.monotonic() - started,
+            **{name: result.get("elapsed") for name, result in results.items()}
+        }
+        return results
+
+    @staticmethod
+    def _timed(source, user_input: str, query_embedding: List[float]):
+        started = time.monotonic()
+        value = source(user_input, query_embedding)
+        return value, time.monotonic() - started
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,140 @@
+import re
+import json
+import time
+import sqlite3
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+class SearchCache:
+    def __init__(self, cache_file: str, ttl: float = 6 * 3600, max_entries: int = 256):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._open()
+
+    def _open(self):
+        try:
+            self._connection = sqlite3.connect(self.cache_file, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            with self._connection:
+                self._connection.execute("""
+                    CREATE TABLE IF NOT EXISTS search_results (
+                        query_key TEXT PRIMARY KEY,
+                        results TEXT NOT NULL,
+                        embeddings BLOB,
+                        dimension INTEGER NOT NULL DEFAULT 0,
+                        created REAL NOT NULL,
+                        last_used REAL NOT NULL
+                    )
+                """)
+                self._connection.execute("DELETE FROM search_results WHERE created < ?", (time.time() - self.ttl,))
+            rows = self._connection.execute(
+                "SELECT query_key, results, embeddings, dimension, created FROM search_results ORDER BY last_used"
+            ).fetchall()
+        except Exception as e:
+            print(f"Search cache error: {str(e)}")
+            self._connection = None
+            return
+
+        for query_key, results, embeddings, dimension, created in rows:
+            results = json.loads(results)
+            if embeddings and dimension:
+                vectors = np.frombuffer(embeddings, dtype=np.float32).reshape(-1, dimension)
+                for result, vector in zip(results, vectors):
+                    result["embedding"] = vector.tolist()
+            self._entries[query_key] = {"results": results, "created": created}
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        # Casing, punctuation and spacing differences should not cost a new search
+        return " ".join(re.findall(r"\w+", query.lower()))
+
+    def get(self, query: str) -> Optional[List[Dict]]:
+        key = self.normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            if time.time() - entry["created"] > self.ttl:
+                self._delete(key)
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            if self._connection is not None:
+                try:
+                    with self._connection:
+                        self._connection.execute(
+                            "UPDATE search_results SET last_used = ? WHERE query_key = ?", (time.time(), key)
+                        )
+                except Exception as e:
+                    print(f"Search cache error: {str(e)}")
+            return [dict(result) for result in entry["results"]]
+
+    def put(self, query: str, results: List[Dict]):
+        key = self.normalize_query(query)
+        now = time.time()
+        stored = [{k: v for k, v in result.items() if k != "embedding"} for result in results]
+        for result in stored:
+            if "similarity" in result:
+                result["similarity"] = float(result["similarity"])
+        embeddings = [result.get("embedding") for result in results]
+        dimension = len(embeddings[0]) if embeddings and embeddings[0] else 0
+        blob = None
+        if dimension and all(embedding and len(embedding) == dimension for embedding in embeddings):
+            blob = np.asarray(embeddings, dtype=np.float32).tobytes()
+        else:
+            dimension = 0
+
+        with self._lock:
+            self._entries[key] = {
+                "results": [{**result, "embedding": embedding} if blob else result
+                            for result, embedding in zip(stored, embeddings)],
+                "created": now
+            }
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+            self.stats["evictions"] += len(evicted)
+            if self._connection is None:
+                return
+            try:
+                with self._connection:
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO search_results (query_key, results, embeddings, dimension, created, last_used) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, json.dumps(stored, ensure_ascii=False), blob, dimension, now, now)
+                    )
+                    self._connection.executemany(
+                        "DELETE FROM search_results WHERE query_key = ?", [(evicted_key,) for evicted_key in evicted]
+                    )
+            except Exception as e:
+                print(f"Search cache error: {str(e)}")
+
+    def _delete(self, key: str):
+        self._entries.pop(key, None)
+        if self._connection is None:
+            return
+        try:
+            with self._connection:
+                self._connection.execute("DELETE FROM search_results WHERE query_key = ?", (key,))
+        except Exception as e:
+            print(f"Search cache error: {str(e)}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,175 @@
+import os
+import json
+import sqlite3
+import argparse
+import threading
+import numpy as np
+from typing import List, Dict, Optional, Iterable, Tuple, Sequence
+
+class SQLiteMemoryStore:
+    def __init__(self, database_file: str):
+        self.database_file = database_file
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(database_file, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    start_timestamp TEXT NOT NULL,
+                    end_timestamp TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    embedding BLOB,
+                    dimension INTEGER NOT NULL DEFAULT 0,
+                    UNIQUE (start_timestamp, end_timestamp)
+                )
+            """)
+            self._connection.execute("CREATE INDEX IF NOT EXISTS idx_summaries_end ON summaries (end_timestamp)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    @staticmethod
+    def _encode(embedding: Optional[Sequence[float]]) -> Tuple[Optional[bytes], int]:
+        if embedding is None or len(embedding) == 0:
+            return None, 0
+        return np.asarray(embedding, dtype=np.float32).tobytes(), len(embedding)
+
+    @staticmethod
+    def _decode(blob: Optional[bytes]) -> List[float]:
+        if not blob:
+            return []
+        return np.frombuffer(blob, dtype=np.float32).tolist()
+
+    def append(self, start_timestamp: str, end_timestamp: str, summary: str,
+               embedding: Optional[Sequence[float]]) -> int:
+        blob, dimension = self._encode(embedding)
+        # An upsert keeps the row id, which the in-memory index uses to read vectors back
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO summaries (start_timestamp, end_timestamp, summary, embedding, dimension) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (start_timestamp, end_timestamp) DO UPDATE SET "
+                "summary = excluded.summary, embedding = excluded.embedding, dimension = excluded.dimension",
+                (start_timestamp, end_timestamp, summary, blob, dimension)
+            )
+            return self._connection.execute(
+                "SELECT id FROM summaries WHERE start_timestamp = ? AND end_timestamp = ?",
+                (start_timestamp, end_timestamp)
+            ).fetchone()[0]
+
+    def replace_all(self, entries: Iterable[Dict]) -> int:
+        rows = []
+        for entry in entries:
+            blob, dimension = self._encode(entry.get("embedding"))
+            rows.append((entry.get("start_timestamp", ""), entry.get("end_timestamp", ""),
+                         entry.get("summary", ""), blob, dimension))
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM summaries")
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO summaries (start_timestamp, end_timestamp, summary, embedding, dimension) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def entries(self, start: Optional[str] = None, end: Optional[str] = None,
+                include_embeddings: bool = True) -> List[Dict]:
+        columns = "id, start_timestamp, end_timestamp, summary" + (", embedding" if include_embeddings else "")
+        query = f"SELECT {columns} FROM summaries"
+        conditions = []
+        parameters = []
+        if start is not None:
+            conditions.append("end_timestamp >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("start_timestamp <= ?")
+            parameters.append(end)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY start_timestamp"
+
+        with self._lock:
+            rows = self._connection.execute(query, parameters).fetchall()
+        result = []
+        for row in rows:
+            entry = {
+                "id": row[0],
+                "start_timestamp": row[1],
+                "end_timestamp": row[2],
+                "summary": row[3]
+            }
+            if include_embeddings:
+                entry["embedding"] = self._decode(row[4])
+            result.append(entry)
+        return result
+
+    def load_vectors(self) -> Tuple[List[Dict], np.ndarray]:
+        with self._lock:
+            dimension_row = self._connection.execute(
+                "SELECT dimension FROM summaries WHERE dimension > 0 ORDER BY id LIMIT 1"
+            ).fetchone()
+            if not dimension_row:
+                return [], np.zeros((0, 0), dtype=np.float32)
+            rows = self._connection.execute(
+                "SELECT id, start_timestamp, end_timestamp, summary, embedding FROM summaries "
+                "WHERE dimension = ? ORDER BY start_timestamp",
+                (dimension_row[0],)
+            ).fetchall()
+        entries = [
+            {"id": row[0], "start_timestamp": row[1], "end_timestamp": row[2], "summary": row[3]}
+            for row in rows
+        ]
+        vectors = np.frombuffer(b"".join(row[4] for row in rows), dtype=np.float32).reshape(len(rows), dimension_row[0])
+        return entries, vectors
+
+    def vectors_for(self, ids: Sequence[int]) -> np.ndarray:
+        if len(ids) == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT id, embedding FROM summaries WHERE id IN ({placeholders})",
+                [int(row_id) for row_id in ids]
+            ).fetchall()
+        blobs = dict(rows)
+        return np.stack([np.frombuffer(blobs[int(row_id)], dtype=np.float32) for row_id in ids])
+
+    def import_jsonl(self, summary_file: str, embeddings_file: str) -> int:
+        summaries = {}
+        embeddings = {}
+        for file_path, target in [(summary_file, summaries), (embeddings_file, embeddings)]:
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        key = (entry.get("start_timestamp"), entry.get("end_timestamp"))
+                        target[key] = entry
+        return self.replace_all(
+            {**summary, "embedding": embeddings.get(key, {}).get("embedding", [])}
+            for key, summary in summaries.items()
+        )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Import chat_summary.jsonl and chat_embeddings.jsonl into the SQLite memory store")
+    parser.add_argument("--data-folder", default="data")
+    args = parser.parse_args()
+
+    store = SQLiteMemoryStore(os.path.join(args.data_folder, "chat_memory.db"))
+    imported = store.import_jsonl(
+        os.path.join(args.data_folder, "chat_summary.jsonl"),
+        os.path.join(args.data_folder, "chat_embeddings.jsonl")
+    )
+    print(f"Imported {imported} summaries into {store.database_file}")
+    store.close()
+
+if __name__ == "__main__":
+    main()
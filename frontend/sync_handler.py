@@ -111,11 +111,22 @@ class SyncHandler:
         if 'Authorization' in self.session.headers:
             del self.session.headers['Authorization']
 
-    def upload_data(self) -> Dict:
+    def upload_data(self, entries: Optional[List[Dict]] = None) -> Dict:
         if not self.auth_token:
             return {"error": "Not authenticated", "details": "No auth token available"}
             
         try:
+            if entries is not None:
+                return self._post_upload([
+                    {
+                        "start_timestamp": entry["start_timestamp"],
+                        "end_timestamp": entry["end_timestamp"],
+                        "summary": entry["summary"],
+                        "embedding": entry["embedding"]
+                    }
+                    for entry in entries if entry.get("embedding")
+                ])
+            
             summary_file = os.path.join(self.data_folder, "chat_summary.jsonl")
             embeddings_file = os.path.join(self.data_folder, "chat_embeddings.jsonl")
             
@@ -145,6 +156,16 @@ class SyncHandler:
                         "embedding": embedding["embedding"]
                     })
             
+            return self._post_upload(data)
+        except Exception as e:
+            return {
+                "error": f"Upload processing failed: {str(e)}",
+                "exception_type": type(e).__name__,
+                "details": str(e)
+            }
+
+    def _post_upload(self, data: List[Dict]) -> Dict:
+        try:
             if not data:
                 return {"error": "No conversation data available to upload", "details": "No valid summaries found"}
             
@@ -0,0 +1,145 @@
+import numpy as np
+from typing import List, Tuple, Optional, Sequence, Callable
+
+class VectorIndex:
+    def __init__(self, dimension: Optional[int] = None, initial_capacity: int = 256):
+        self.dimension = dimension
+        self.size = 0
+        self._capacity = initial_capacity
+        self._matrix = None
+        if dimension:
+            self._matrix = np.zeros((initial_capacity, dimension), dtype=np.float32)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._matrix is None:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
+        return self._matrix[:self.size]
+
+    @staticmethod
+    def normalize(vectors) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            norm = np.linalg.norm(matrix)
+            return matrix / norm if norm > 0 else matrix
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _reserve(self, extra_rows: int):
+        required = self.size + extra_rows
+        if self._matrix is None:
+            self._capacity = max(self._capacity, required)
+            self._matrix = np.zeros((self._capacity, self.dimension), dtype=np.float32)
+            return
+        if required <= self._capacity:
+            return
+        while self._capacity < required:
+            self._capacity *= 2
+        grown = np.zeros((self._capacity, self.dimension), dtype=np.float32)
+        grown[:self.size] = self._matrix[:self.size]
+        self._matrix = grown
+
+    def accepts(self, embedding: Sequence[float]) -> bool:
+        if embedding is None or len(embedding) == 0:
+            return False
+        return self.dimension is None or len(embedding) == self.dimension
+
+    def add(self, embedding: Sequence[float]) -> int:
+        if not self.accepts(embedding):
+            raise ValueError(f"Embedding dimension {len(embedding) if embedding is not None else 0} does not match index dimension {self.dimension}")
+        if self.dimension is None:
+            self.dimension = len(embedding)
+        self._reserve(1)
+        self._matrix[self.size] = self.normalize(embedding)
+        self.size += 1
+        return self.size - 1
+
+    def add_many(self, embeddings: Sequence[Sequence[float]]) -> List[int]:
+        if len(embeddings) == 0:
+            return []
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or (self.dimension is not None and matrix.shape[1] != self.dimension):
+            return [self.add(embedding) for embedding in embeddings]
+        if self.dimension is None:
+            self.dimension = matrix.shape[1]
+        self._reserve(len(matrix))
+        start = self.size
+        self._matrix[start:start + len(matrix)] = self.normalize(matrix)
+        self.size += len(matrix)
+        return list(range(start, self.size))
+
+    def replace(self, row: int, embedding: Sequence[float]):
+        if not self.accepts(embedding):
+            raise ValueError(f"Embedding dimension {len(embedding) if embedding is not None else 0} does not match index dimension {self.dimension}")
+        self._matrix[row] = self.normalize(embedding)
+
+    def scores(self, query: Sequence[float]) -> np.ndarray:
+        if self.size == 0 or not self.accepts(query):
+            return np.zeros(0, dtype=np.float32)
+        return self.vectors @ self.normalize(query)
+
+    def search(self, query: Sequence[float], top_k: int, threshold: Optional[float] = None) -> List[Tuple[int, float]]:
+        scores = self.scores(query)
+        if scores.size == 0 or top_k <= 0:
+            return []
+
+        if top_k < scores.size:
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(scores.size)
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        results = []
+        for row in candidates:
+            score = float(scores[row])
+            if threshold is not None and score <= threshold:
+                break
+            results.append((int(row), score))
+        return results
+
+class MappedVectorIndex(VectorIndex):
+    # Scores straight against rows that live outside the process heap, such as a memory-mapped
+    # store of unit-length vectors; only the row numbers are held in memory
+    def __init__(self, source: Callable[[], np.ndarray], block_size: int = 8192):
+        super().__init__()
+        self.source = source
+        self.block_size = block_size
+        self._rows = np.zeros(0, dtype=np.int64)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return np.asarray(self.source()[self._rows], dtype=np.float32)
+
+    def add(self, embedding: Sequence[float]) -> int:
+        raise TypeError("MappedVectorIndex takes source rows through add_rows")
+
+    def add_many(self, embeddings: Sequence[Sequence[float]]) -> List[int]:
+        raise TypeError("MappedVectorIndex takes source rows through add_rows")
+
+    def add_rows(self, rows: Sequence[int]) -> List[int]:
+        if len(rows) == 0:
+            return []
+        self.dimension = self.dimension or self.source().shape[1]
+        start = self.size
+        self._rows = np.concatenate([self._rows, np.asarray(rows, dtype=np.int64)])
+        self.size = len(self._rows)
+        return list(range(start, self.size))
+
+    def replace(self, row: int, embedding: Sequence[float]):
+        raise TypeError("MappedVectorIndex takes source rows through replace_row")
+
+    def replace_row(self, row: int, source_row: int):
+        self._rows[row] = source_row
+
+    def scores(self, query: Sequence[float]) -> np.ndarray:
+        if self.size == 0 or not self.accepts(query):
+            return np.zeros(0, dtype=np.float32)
+        normalized_query = self.normalize(query)
+        matrix = self.source()
+        # Blocks keep a float16 store from being widened to float32 all at once
+        source_scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), self.block_size):
+            block = np.asarray(matrix[start:start + self.block_size], dtype=np.float32)
+            source_scores[start:start + len(block)] = block @ normalized_query
+        return source_scores[self._rows]
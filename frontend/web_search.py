@@ -1,70 +1,134 @@
+import os
+import time
 import requests
-from bs4 import BeautifulSoup
-from typing import List, Dict, Tuple
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Callable, List, Dict, Tuple, Optional
 from sklearn.metrics.pairwise import cosine_similarity
-import ollama
-import time
+from embedding_service import EmbeddingService
+from llm_backend import ModelBackend
+from search_cache import SearchCache
+from page_fetcher import PageFetcher
+from rate_limiter import RateLimiter
+from ddg_parser import parse_results
+import threading
 
 class WebSearchHandler:
-    def __init__(self):
+    def __init__(self, embedding_service: Optional[EmbeddingService] = None,
+                 search_url: str = "https://html.duckduckgo.com/html/", data_folder: str = "data",
+                 backend: Optional[ModelBackend] = None):
+        self.embedding_service = embedding_service or EmbeddingService(data_folder=data_folder, backend=backend)
         self.enabled = False
         self.max_results = 3
-        self.last_search_time = 0
-        self.last_search_failed = False
+        self.search_url = search_url
+        # One search every 2 seconds on average, with no burst, like the old fixed spacing
+        self.rate_limiter = RateLimiter(rate=0.5, capacity=1)
+        self.data_folder = data_folder
+        os.makedirs(self.data_folder, exist_ok=True)
+        self.cache = SearchCache(os.path.join(self.data_folder, "search_cache.db"))
+        # One keep-alive session so repeated searches reuse the TLS connection
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; rv:91.0) Gecko/20100101 Firefox/91.0',
+            'Accept-Language': 'ru-RU,ru;q=0.9'
+        })
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.deep_search = False
+        self.deep_search_pages = 3
+        self.deep_search_budget = 4.0
+        self.deep_search_passages = 2
+        self.page_fetcher = PageFetcher(self.session)
+        self._passage_executor = ThreadPoolExecutor(max_workers=1)
         
     def toggle_enabled(self, enabled: bool):
         self.enabled = enabled
 
-    def perform_search(self, query: str) -> List[Dict]:
-        self.last_search_failed = False
+    def expected_wait(self) -> float:
+        return self.rate_limiter.expected_wait(self.search_url)
+
+    def perform_search(self, query: str, max_wait: Optional[float] = None,
+                       query_embedding: Optional[List[float]] = None) -> Tuple[List[Dict], bool, float]:
+        # Returns the results, whether the search failed and, if it was rate limited, the seconds
+        # until it is allowed. Nothing is kept on the handler, since a timed-out search from an
+        # earlier turn may still be running.
         if not self.enabled:
-            return []
+            return [], False, 0.0
+
+        cached = self._cached_results(query, query_embedding)
+        if cached is not None:
+            return cached, False, 0.0
+
+        # Waits in line with other callers; with max_wait the caller is told the delay instead
+        if not self.rate_limiter.acquire(self.search_url, max_wait):
+            return [], False, self.expected_wait()
+        results, failed = self._search(query, query_embedding)
+        return results, failed, 0.0
 
-        current_time = time.time()
-        if current_time - self.last_search_time < 2:
-            time.sleep(2 - (current_time - self.last_search_time))
-        self.last_search_time = time.time()
+    def queue_search(self, query: str,
+                     callback: Callable[[List[Dict], bool], None]) -> Optional[threading.Timer]:
+        # Runs the search on a timer thread once the rate limiter allows it, so the caller never blocks;
+        # callback gets the results and whether the search failed
+        if not self.enabled:
+            callback([], False)
+            return None
+        cached = self._cached_results(query)
+        if cached is not None:
+            callback(cached, False)
+            return None
+        return self.rate_limiter.call_when_ready(self.search_url, lambda: callback(*self._search(query)))
 
+    def _cached_results(self, query: str, query_embedding: Optional[List[float]] = None) -> Optional[List[Dict]]:
+        cached = self.cache.get(query)
+        if cached is None:
+            return None
+        if self.deep_search and not any('passages' in result for result in cached[:self.deep_search_pages]):
+            self._add_page_passages(query, cached, query_embedding)
+            self.cache.put(query, cached)
+        return cached[:self.max_results]
+
+    def _search(self, query: str, query_embedding: Optional[List[float]] = None) -> Tuple[List[Dict], bool]:
         try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; rv:91.0) Gecko/20100101 Firefox/91.0',
-                'Accept-Language': 'ru-RU,ru;q=0.9'
-            }
-            
-            response = requests.get(
-                f"https://html.duckduckgo.com/html/?q={query}&kl=ru-ru",
-                headers=headers,
-                timeout=15
-            )
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'lxml')
+            # Streamed so the parser can stop reading once it has enough results
+            with self.session.get(
+                self.search_url,
+                params={"q": query, "kl": "ru-ru"},
+                timeout=15,
+                stream=True
+            ) as response:
+                response.raise_for_status()
+                parsed = parse_results(response.iter_content(chunk_size=8192), self.max_results * 2)
+                self._drain(response)
+
             results = []
+            for result in parsed:
+                url = self._clean_ddg_url(result['url'])
+                if url:
+                    results.append({**result, 'url': url})
             
-            for result in soup.select('.result__body'):
-                title_elem = result.select_one('.result__title a')
-                snippet_elem = result.select_one('.result__snippet')
-                
-                if title_elem and snippet_elem:
-                    title = title_elem.text.strip()
-                    snippet = snippet_elem.text.strip()
-                    url = self._clean_ddg_url(title_elem.get('href', ''))
-                    
-                    if url and title and snippet:
-                        results.append({
-                            'title': title,
-                            'url': url,
-                            'content': snippet
-                        })
-                        if len(results) >= self.max_results * 2:
-                            break
-            
-            return self._filter_relevant_results(query, results)[:self.max_results]
+            relevant = self._filter_relevant_results(query, results, query_embedding)
+            if self.deep_search:
+                self._add_page_passages(query, relevant, query_embedding)
+            # Only scored results are cached, so a hit never needs Ollama again
+            if relevant and all('embedding' in result for result in relevant):
+                self.cache.put(query, relevant)
+            return relevant[:self.max_results], False
             
         except Exception as e:
             print(f"Search error: {str(e)}")
-            self.last_search_failed = True
-            return []
+            return [], True
+
+    @staticmethod
+    def _drain(response: requests.Response, limit: int = 512 * 1024):
+        # Parsing stops early, but a response released with unread body makes urllib3 drop the
+        # connection; reading the rest (a DDG page is about 65 KB) returns it to the pool
+        read = 0
+        while read < limit:
+            chunk = response.raw.read(65536)
+            if not chunk:
+                return
+            read += len(chunk)
 
     def _clean_ddg_url(self, url: str) -> str:
         if 'uddg=' in url:
@@ -72,18 +136,30 @@ class WebSearchHandler:
             return unquote(url.split('uddg=')[1])
         return url
 
-    def _filter_relevant_results(self, query: str, results: List[Dict]) -> List[Dict]:
+    def _embed_with_query(self, query: str, texts: List[str],
+                          query_embedding: Optional[List[float]]) -> List[List[float]]:
+        # A caller that already embedded the query saves it from being looked up again; an empty
+        # embedding means that attempt failed, and without it the texts cannot be scored either
+        if query_embedding is not None:
+            if not query_embedding:
+                return [[]] + [[] for _ in texts]
+            return [query_embedding] + self.embedding_service.get_embeddings(texts)
+        return self.embedding_service.get_embeddings([query] + texts)
+
+    def _filter_relevant_results(self, query: str, results: List[Dict],
+                                 query_embedding: Optional[List[float]] = None) -> List[Dict]:
         if not results:
             return []
 
-        query_embedding = self._get_embedding(query)
+        embeddings = self._embed_with_query(
+            query, [f"{result['title']}\n{result['content']}" for result in results], query_embedding
+        )
+        query_embedding = embeddings[0]
         if not query_embedding:
             return results
 
         scored_results = []
-        for result in results:
-            text = f"{result['title']}\n{result['content']}"
-            embedding = self._get_embedding(text)
+        for result, embedding in zip(results, embeddings[1:]):
             if not embedding:
                 continue
 
@@ -91,17 +167,46 @@ class WebSearchHandler:
                 similarity = cosine_similarity([query_embedding], [embedding])[0][0]
                 scored_results.append({
                     **result,
-                    'similarity': similarity
+                    'similarity': float(similarity),
+                    'embedding': embedding
                 })
             except ValueError:
                 continue
 
         return sorted(scored_results, key=lambda x: x['similarity'], reverse=True)
 
-    def _get_embedding(self, text: str) -> List[float]:
+    def _add_page_passages(self, query: str, results: List[Dict], query_embedding: Optional[List[float]] = None):
+        deadline = time.monotonic() + self.deep_search_budget
+        top_results = results[:min(self.deep_search_pages, self.max_results)]
+        pages = self.page_fetcher.fetch_many([result['url'] for result in top_results], self.deep_search_budget)
+        candidates = [(result, passage) for result in top_results for passage in pages.get(result['url'], [])]
+        remaining = deadline - time.monotonic()
+        if not candidates or remaining <= 0:
+            return
+
+        # Embedding counts against the same budget; passages that miss it are left out this time,
+        # and the embeddings still finishing in the background are cached for the next hit
+        future = self._passage_executor.submit(
+            self._embed_with_query, query, [passage for _, passage in candidates], query_embedding
+        )
         try:
-            response = ollama.embeddings(model='nomic-embed-text', prompt=text)
-            return response['embedding']
-        except Exception as e:
-            print(f"Embedding error: {str(e)}")
-            return None
+            embeddings = future.result(timeout=remaining)
+        except TimeoutError:
+            return
+        query_embedding = embeddings[0]
+        if not query_embedding:
+            return
+        scored = {}
+        for (result, passage), embedding in zip(candidates, embeddings[1:]):
+            if embedding:
+                similarity = float(cosine_similarity([query_embedding], [embedding])[0][0])
+                scored.setdefault(result['url'], []).append((similarity, passage))
+        for result in top_results:
+            best = sorted(scored.get(result['url'], []), reverse=True)[:self.deep_search_passages]
+            result['passages'] = [passage for _, passage in best]
+
+    def close(self):
+        self._passage_executor.shutdown(wait=False, cancel_futures=True)
+        self.page_fetcher.close()
+        self.session.close()
+        self.cache.close()
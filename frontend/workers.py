@@ -0,0 +1,47 @@
+import threading
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+class WorkerSignals(QObject):
+    chunk = Signal(object)
+    result = Signal(object)
+    error = Signal(str)
+    finished = Signal()
+
+class Worker(QRunnable):
+    # Runs a function on a QThreadPool thread; signals are queued back to the GUI thread.
+    # With stream=True the function must return an iterator and each item is emitted as a chunk.
+    def __init__(self, function, *args, stream: bool = False, **kwargs):
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.stream = stream
+        self.signals = WorkerSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def run(self):
+        try:
+            result = self.function(*self.args, **self.kwargs)
+            if self.stream:
+                for chunk in result:
+                    # Emitted before the check so the window shows everything the generator has produced
+                    self.signals.chunk.emit(chunk)
+                    if self.cancelled:
+                        # Closing the generator lets it stop the request and clean up
+                        result.close()
+                        break
+                result = None
+            if not self.cancelled:
+                self.signals.result.emit(result)
+        except Exception as e:
+            print(f"Worker error: {str(e)}")
+            self.signals.error.emit(str(e))
+        finally:
+            self.signals.finished.emit()